@@ -0,0 +1,561 @@
+#!/usr/bin/env python
+"""Benchmarks of the render pipeline, run from the repository root: python3 bench.py <benchmark> [options]"""
+import argparse
+import csv
+import datetime
+import importlib.util
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import ImageDraw
+
+import numpy as np
+
+import export
+import importer
+import profiling
+import worktime
+from preview import PagePreview
+from suggest import Suggestions
+from text_cache import TextCache
+
+locations = ['Lab', 'Schule', 'Museum', 'Ferienprogramm', 'Forschertag']
+
+
+def sample_payload(rows=22, use_template=True, year=2025, month=2):
+    """A synthetic payload with the given number of rows (plain data, as accepted by export.py)."""
+    entries = []
+    for i in range(rows):
+        date = datetime.date(year, month + 1, i % 28 + 1)
+        start, end = 8 + i % 4, 12 + i % 8
+        work_minutes, _ = worktime.work_break(start * 60, end * 60)
+        entries.append([date.isoformat(), f'{start:02}:00', f'{end:02}:00', worktime.clock(work_minutes),
+                        locations[i % len(locations)]])
+    return {"name": "Max Mustermann", "iban": "DE89370400440532013000", "month": month, "year": year,
+            "use_pdf_template": use_template, "entries": entries}
+
+
+def timed(func, repeat):
+    """Run func once as warm-up and then repeat times, returns (first, mean of the repetitions) in seconds."""
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return first, (time.perf_counter() - start) / max(repeat, 1)
+
+
+def bench_backends(args):
+    """Render time and file size of the raster and the vector PDF backend."""
+    payload = sample_payload(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        output_fname = os.path.join(tmp, 'bench')
+        print(f'{"backend":<8} {"scale":>5} {"first (s)":>10} {"mean (s)":>9} {"size (kB)":>10}')
+        for vector in (False, True):
+            for scale in args.scales:
+                template = None if vector else export.get_template(payload["use_pdf_template"], scale)
+                first, mean = timed(lambda: export.export_to_pdf(payload, template, output_fname, scale=scale,
+                                                                 vector=vector), args.repeat)
+                size = os.path.getsize(f'{output_fname}.pdf') / 1000
+                print(f'{"vector" if vector else "raster":<8} {scale:>5} {first:>10.3f} {mean:>9.3f} {size:>10.1f}')
+
+
+def bench_preview(args):
+    """Time per edit of the incremental live preview on the full-resolution template."""
+    payload = sample_payload(args.rows)
+    start = time.perf_counter()
+    preview = PagePreview(export.load_template(payload["use_pdf_template"]))
+    preview.update(payload)
+    print(f'initial render: {time.perf_counter() - start:.3f} s')
+
+    edits = {
+        'name': lambda i: payload.update(name=f'Max Mustermann {i}'),
+        'iban': lambda i: payload.update(iban=f'DE8937040044053201{i % 10000:04}'),
+        'month': lambda i: payload.update(month=i % 12),
+        'row location': lambda i: payload["entries"][i % len(payload["entries"])].__setitem__(4, f'Lab {i}'),
+        'row times': lambda i: payload["entries"][i % len(payload["entries"])].__setitem__(2, f'{13 + i % 8:02}:00'),
+        'add/remove row': lambda i: payload["entries"].append(payload["entries"][0]) if i % 2 else
+        payload["entries"].pop(),
+    }
+    for edit, apply in edits.items():
+        times = []
+        for i in range(1, args.repeat + 1):
+            apply(i)
+            start = time.perf_counter()
+            preview.update(payload)
+            times.append(time.perf_counter() - start)
+        print(f'{edit:<15} mean {sum(times) / len(times) * 1000:6.1f} ms, max {max(times) * 1000:6.1f} ms')
+
+
+def bench_text_cache(args):
+    """Text drawing time of a month of rows for a team, with and without the text mask cache."""
+    payloads = []
+    for person in range(args.repeat):
+        payload = sample_payload(args.rows)
+        payload["name"] = f'Max Mustermann {person}'
+        payload["entries"] = payload["entries"][person % 3:]
+        payloads.append(payload)
+    for scale in args.scales:
+        page = export.get_template(True, scale).copy()
+        draw = ImageDraw.Draw(page)
+        cache = TextCache()
+
+        start = time.perf_counter()
+        for payload in payloads:
+            for position, text, font in export.text_items(payload, scale):
+                draw.text(position, text, font=font, fill=(0, 0, 0))
+        uncached = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for payload in payloads:
+            for position, text, font in export.text_items(payload, scale):
+                cache.draw(page, position, text, font)
+        cached = time.perf_counter() - start
+
+        info = cache.info()
+        print(f'scale {scale:<5} {len(payloads)} reports: uncached {uncached / len(payloads) * 1000:6.1f} ms, '
+              f'cached {cached / len(payloads) * 1000:6.1f} ms per report '
+              f'({info["hits"]} hits, {info["misses"]} misses)')
+
+
+def bench_import(args):
+    """Rows per second of the headless importer (reading and validating, without rendering) on a large CSV file."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(importer.csv_columns)
+    people = max(args.repeat, 1) * 100
+    for person in range(people):
+        payload = sample_payload(args.rows, month=person % 12)
+        for date, start, end, _, location in payload["entries"]:
+            writer.writerow([f'Person {person}', payload["iban"], payload["year"], payload["month"] + 1,
+                             date, start, end, location])
+    importer.iban_error(sample_payload(0)["iban"])  # schwifty's registry is loaded once per process
+    for step in ('read', 'validate'):
+        buffer.seek(0)
+        start = time.perf_counter()
+        reports, rows, errors = importer.read_csv(buffer)
+        if step == 'validate':
+            payloads, errors = importer.validate(reports, rows)
+        seconds = time.perf_counter() - start
+        print(f'{step:<9} {len(rows["line"])} rows of {len(reports)} reports in {seconds:.3f} s '
+              f'({len(rows["line"]) / seconds:,.0f} rows/s, {len(errors)} errors)')
+
+
+def bench_suggest(args):
+    """Time per query of the job info suggestions against sorting all counts (as main.py did), for large histories."""
+    random.seed(0)
+    now = time.time()
+    for size in (100, 10000, 100000):
+        suggestions, counts = Suggestions(), {}
+        for _ in range(size * 3):
+            info = f'{random.choice(locations)} {random.randrange(size)}'
+            suggestions.add(info, when=now - random.uniform(0, 365 * 24 * 3600))
+            counts[info] = counts.get(info, 0) + 1
+        prefixes = ['', 'L', 'Mu', 'Schule 1', 'Ferienprogramm 12', 'X']
+        repeat = max(args.repeat, 1) * 200
+        start = time.perf_counter()
+        for i in range(repeat):
+            suggestions.top(prefixes[i % len(prefixes)])
+        query = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        sorted(counts, key=counts.get, reverse=True)
+        print(f'{len(suggestions):>6} infos: top 10 by prefix {query * 1e6:7.1f} us, '
+              f'sorting all counts {(time.perf_counter() - start) * 1e3:7.2f} ms')
+
+
+def bench_locations(args):
+    """
+    Time per finished location edit with 22 rows: rebuilding every row's combo box (as main-gui.py did)
+    against the single change of the shared location model, for growing location histories.
+    """
+    gui, app = load_gui()
+    repeat = max(args.repeat, 1) * 10
+    for size in (10, 1000, 10000):
+        history = [f'{locations[i % len(locations)]} {i}' for i in range(size)]
+        window = gui.TimeTrackingApp({'name': 'Max Mustermann', 'iban': '', 'use_template': True,
+                                      'locations': history}, preload=False)
+        while window.model.rowCount() < export.ROWS_PER_PAGE:
+            window.add_row()
+        combos = [gui.QComboBox() for _ in range(export.ROWS_PER_PAGE)]
+        for combo in combos:
+            combo.setEditable(True)
+            combo.addItems(history)
+
+        start = time.perf_counter()
+        for i in range(repeat):
+            entry = history[i * 7 % size]
+            history.remove(entry)
+            history.insert(0, entry)
+            for combo in combos:
+                text = combo.lineEdit().text()
+                combo.clear()
+                combo.addItems(history)
+                combo.lineEdit().setText(text)
+        rebuild = (time.perf_counter() - start) / repeat
+
+        combo = gui.QComboBox()
+        combo.setEditable(True)
+        combo.setModel(window.locations_model)
+        shared = 0
+        for i in range(repeat):
+            combo.lineEdit().setText(history[i * 7 % size])
+            start = time.perf_counter()
+            window.update_locations(combo)
+            shared += (time.perf_counter() - start) / repeat
+        print(f'{size:>6} locations: rebuilding {rebuild * 1e3:8.2f} ms, shared model {shared * 1e3:6.3f} ms per edit')
+        window.deleteLater()
+    app.processEvents()
+
+
+def bench_table(args):
+    """
+    Time to fill the table and to switch the month for growing row counts: one persistent editor widget per cell
+    (as main-gui.py did) against the table model, whose editors are only created while a cell is edited.
+    """
+    gui, app = load_gui()
+    from PyQt5.QtWidgets import QTableWidget, QTableWidgetItem
+    window = gui.TimeTrackingApp({'name': 'Max Mustermann', 'iban': '', 'use_template': True,
+                                  'locations': locations}, preload=False)
+    window.update_preview = lambda: None  # only the table is timed, not the preview
+    entries = sample_payload(export.ROWS_PER_PAGE)["entries"]
+    print(f'{"rows":>5} {"widgets fill":>13} {"month":>9} {"model fill":>11} {"month":>9} {"read":>9}')
+    for size in (export.ROWS_PER_PAGE, 220, 880):
+        rows = [entries[i % len(entries)] for i in range(size)]
+        start = time.perf_counter()
+        table = QTableWidget(0, 7)
+        for date, start_time, end_time, work_time, location in rows:
+            row = table.rowCount()
+            table.insertRow(row)
+            table.setCellWidget(row, 0, gui.QDateEdit(gui.QDate.fromString(date, gui.Qt.ISODate)))
+            table.setCellWidget(row, 1, gui.QTimeEdit(gui.QTime.fromString(start_time, "HH:mm")))
+            table.setCellWidget(row, 2, gui.QTimeEdit(gui.QTime.fromString(end_time, "HH:mm")))
+            table.setItem(row, 3, QTableWidgetItem(work_time))
+            table.setItem(row, 4, QTableWidgetItem("00:30"))
+            combo = gui.QComboBox()
+            combo.addItems(locations)
+            combo.setEditable(True)
+            combo.setEditText(location)
+            table.setCellWidget(row, 5, combo)
+            table.setCellWidget(row, 6, gui.QPushButton("Delete"))
+        widgets_fill = time.perf_counter() - start
+        start = time.perf_counter()
+        for row in range(table.rowCount()):
+            table.cellWidget(row, 0).setDate(gui.QDate(2025, 4, 1))
+        widgets_month = time.perf_counter() - start
+
+        start = time.perf_counter()
+        window.model.set_entries(rows)
+        app.processEvents()
+        model_fill = time.perf_counter() - start
+        start = time.perf_counter()
+        window.model.set_month(2025, 4)
+        app.processEvents()
+        model_month = time.perf_counter() - start
+        start = time.perf_counter()
+        export.plain_payload(window.payload())
+        read = time.perf_counter() - start
+        print(f'{size:>5} {widgets_fill * 1e3:10.1f} ms {widgets_month * 1e3:6.1f} ms '
+              f'{model_fill * 1e3:8.1f} ms {model_month * 1e3:6.1f} ms {read * 1e3:6.1f} ms')
+        table.deleteLater()
+        app.processEvents()
+
+
+def reference_row(start, end):
+    """Work and break minutes of one row, computed per row as main-gui.py did before worktime.py."""
+    minutes = (end - start) % (24 * 60)
+    break_minutes = 45 if minutes > 9 * 60 else 30 if minutes > 6 * 60 else 0
+    return minutes - break_minutes, break_minutes
+
+
+def bench_worktime(args):
+    """
+    Time worktime.py against the per-row calculation the frontends used before for a month, a batch of months and a
+    million rows (test_worktime.py checks that both agree).
+    """
+    rng = np.random.default_rng(0)
+    starts = rng.integers(0, 24 * 60, 200000)
+    ends = rng.integers(0, 24 * 60, 200000)
+    print(f'{"rows":>8} {"per row":>12} {"arrays":>11}')
+    for months_count in (1, 1000, 45455):
+        rows = export.ROWS_PER_PAGE * months_count
+        batch_starts, batch_ends = np.resize(starts, rows), np.resize(ends, rows)
+        batch_months = np.arange(rows) // export.ROWS_PER_PAGE
+        start_list, end_list = batch_starts.tolist(), batch_ends.tolist()
+        _, per_row = timed(lambda: [reference_row(start, end) for start, end in zip(start_list, end_list)],
+                           max(args.repeat // months_count, 1))
+        _, arrays = timed(lambda: worktime.totals(batch_starts, batch_ends, batch_months), args.repeat)
+        print(f'{rows:>8} {per_row * 1e3:9.2f} ms {arrays * 1e3:8.3f} ms')
+
+
+def bench_totals(args):
+    """
+    Time per edited row of the monthly totals: updating them by the change of the row against summing all rows again
+    (test_rows.py checks that both agree).
+    """
+    from rows import Rows
+    rng = random.Random(0)
+    repeat = max(args.repeat, 1) * 100
+    for size in (export.ROWS_PER_PAGE, 880, 22000):
+        rows = Rows(sample_payload(size)["entries"])
+        edits = [(rng.randrange(size), rng.randrange(24 * 60), rng.randrange(24 * 60), rng.choice(locations))
+                 for _ in range(repeat)]
+        start = time.perf_counter()
+        for row, start_minutes, end_minutes, location in edits:
+            rows.set_times(row, start_minutes, end_minutes)
+            rows.set_location(row, location)
+        incremental = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat // 10):
+            work, _ = worktime.work_breaks(*rows.times())
+            per_location = {}
+            for location, minutes in zip(rows.locations, work.tolist()):
+                per_location[location] = per_location.get(location, 0) + minutes
+        rescan = (time.perf_counter() - start) / (repeat // 10)
+        print(f'{size:>6} rows: incremental {incremental * 1e6:7.1f} us, summing all rows {rescan * 1e6:9.1f} us per edit')
+
+
+def bench_modes(args):
+    """
+    The gray render modes against RGB: the visual difference of each page from the RGB page converted to gray
+    (the bilevel page from the RGB page thresholded at half intensity), the memory of the page, the render and encode
+    time and the PDF size, per scale (test_modes.py checks the differences against tolerances).
+    """
+    from PIL import ImageChops
+    payload = sample_payload(args.rows)
+    print(f'{"scale":>5} {"mode":<4} {"max diff":>8} {"mean diff":>9} {"pixels off":>10} {"page (MB)":>9} '
+          f'{"render (s)":>10} {"encode (s)":>10} {"size (kB)":>9}')
+    for scale in args.scales:
+        reference = None
+        for mode in export.MODES:
+            template = export.get_template(payload["use_pdf_template"], scale, mode=mode)
+            page = export.render(payload, template, scale)
+            if mode == 'RGB':
+                reference = page.convert('L')
+                difference = ImageChops.difference(reference, reference)
+            elif mode == 'L':
+                difference = ImageChops.difference(reference, page)
+            else:
+                difference = ImageChops.difference(reference.point([0] * 128 + [255] * 128), page.convert('L'))
+            histogram = difference.histogram()
+            pixels = page.width * page.height
+            max_diff = max(value for value, count in enumerate(histogram) if count)
+            mean_diff = sum(value * count for value, count in enumerate(histogram)) / pixels
+            pixels_off = 1 - histogram[0] / pixels
+            memory = pixels * (4 if mode == 'RGB' else 1)  # Pillow holds RGB as 4 bytes per pixel, L and 1 as one
+            render_time = timed(lambda: export.render(payload, template, scale), args.repeat)[1]
+            size, seconds = export.write_report(payload, io.BytesIO(), template=template, scale=scale)
+            print(f'{scale:>5} {mode:<4} {max_diff:>8} {mean_diff:>9.3f} {pixels_off:>10.2%} {memory / 1e6:>9.1f} '
+                  f'{render_time:>10.3f} {seconds["encode"]:>10.3f} {size / 1000:>9.1f}')
+
+
+RENDER_ROWS = [1, 5, 11, 22, 44, 220]  # single reports, the last two fill several pages
+RENDER_BATCH = (22, 20)  # rows per report and reports of the batch case
+
+
+def render_case(case):
+    """
+    Render one case of bench_render in this (fresh) process: a first cold run including the template decode, then
+    warm repetitions. Returns the case with the stage times of both, the output size and the peak RSS.
+    """
+    import resource
+    import template_cache
+    if case['cold_cache']:  # the template is decoded from the PNG instead of the raw cache
+        template_cache.cache_dir = tempfile.mkdtemp(prefix='explorhino-bench-')
+    payloads = []
+    for person in range(case['reports']):
+        payload = sample_payload(case['rows'])
+        payload["name"] = f'Max Mustermann {person}'
+        payloads.append(payload)
+    vector, scale, mode = case['backend'] == 'vector', case['scale'], case['mode']
+    budget = None if vector or case['budget'] is None else int(case['budget'] * 2 ** 20)
+
+    def run():
+        size = 0
+        for payload in payloads:
+            template = None
+            if not vector and budget is None:
+                template = export.get_template(payload["use_pdf_template"], scale, mode=mode)
+            size += export.write_report(payload, io.BytesIO(), template=template, scale=scale, vector=vector,
+                                        mode=mode, budget=budget)[0]
+        return size
+
+    results = dict(case, pages=export.page_count(payloads[0]) * len(payloads))
+    for run_name, repeat in (('cold', 1), ('warm', case['repeat'])):
+        with profiling.profile() as times:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                results['bytes'] = run()
+            seconds = (time.perf_counter() - start) / repeat
+        stages = {name: stage['seconds'] / repeat for name, stage in times.as_dict().items()}
+        results[run_name] = {'seconds': seconds, 'stages': stages}
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results['peak_rss_mb'] = peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+    if case['cold_cache']:
+        import shutil
+        shutil.rmtree(template_cache.cache_dir, ignore_errors=True)
+    return results
+
+
+def bench_render(args):
+    """
+    The render benchmark suite: every case (backend, mode, scale, rows, reports) runs in a fresh process, so that the
+    peak RSS and the cold start (template decode, font load) belong to that case alone. The time of every stage of the cold
+    and of the warm runs is written to a JSON file, --compare prints the change against the results of an older version.
+    """
+    import multiprocessing
+    import platform
+    import PIL
+    from concurrent.futures import ProcessPoolExecutor
+    cases = [{'backend': backend, 'mode': mode, 'scale': scale, 'rows': rows, 'reports': reports,
+              'budget': args.memory_budget, 'cold_cache': args.cold_cache, 'repeat': max(args.repeat, 1)}
+             for backend in args.backends for mode in args.modes for scale in args.scales
+             for rows, reports in [(rows, 1) for rows in RENDER_ROWS] + [RENDER_BATCH]]
+    commit = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True).stdout.strip()
+    results = {'version': commit or None, 'created': datetime.datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(), 'pillow': PIL.__version__, 'platform': platform.platform(),
+               'cases': []}
+
+    print(f'{"backend":<7} {"mode":<4} {"scale":>5} {"rows":>4} {"reports":>7} {"pages":>5} {"cold (s)":>8} '
+          f'{"warm (s)":>8} {"size (kB)":>9} {"peak RSS (MB)":>13}  slowest warm stages')
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(render_case, case).result()
+        results['cases'].append(result)
+        slowest = sorted(result['warm']['stages'].items(), key=lambda item: -item[1])[:3]
+        print(f'{case["backend"]:<7} {case["mode"]:<4} {case["scale"]:>5} {case["rows"]:>4} {case["reports"]:>7} '
+              f'{result["pages"]:>5} {result["cold"]["seconds"]:>8.3f} {result["warm"]["seconds"]:>8.3f} '
+              f'{result["bytes"] / 1000:>9.1f} {result["peak_rss_mb"]:>13.1f}  '
+              + ', '.join(f'{name} {seconds:.3f}' for name, seconds in slowest))
+
+    profiling.dump(results, args.output)
+    if args.output != '-':
+        print(f'results written to {args.output}')
+    if args.compare:
+        compare_render(results, args.compare)
+
+
+def case_key(case):
+    # results of older versions were all rendered in RGB and without a memory budget
+    return (case['backend'], case.get('mode', 'RGB'), case['scale'], case['rows'], case['reports'], case.get('budget'),
+            case['cold_cache'])
+
+
+def compare_render(results, fname):
+    """Print the change of the warm time, the cold time and the peak RSS of every case found in older results."""
+    import json
+    with open(fname, encoding='utf-8') as file:
+        old = json.load(file)
+    old_cases = {case_key(case): case for case in old['cases']}
+    print(f'compared with {old.get("version")} ({old.get("created")}):')
+    for case in results['cases']:
+        before = old_cases.get(case_key(case))
+        if before is None:
+            continue
+        changes = [(what, value(case) / value(before) - 1) for what, value in
+                   (('warm', lambda c: c['warm']['seconds']), ('cold', lambda c: c['cold']['seconds']),
+                    ('peak RSS', lambda c: c['peak_rss_mb']))]
+        flag = '  <- slower' if changes[0][1] > 0.1 else ''
+        print(f'{case["backend"]:<7} {case["mode"]:<4} {case["scale"]:>5} {case["rows"]:>4} {case["reports"]:>3}  '
+              + ', '.join(f'{what} {change:+7.1%}' for what, change in changes) + flag)
+
+
+def load_gui():
+    """Import main-gui.py (which cannot be imported by name) and create the QApplication, offscreen by default."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    spec = importlib.util.spec_from_file_location('main_gui', 'main-gui.py')
+    gui = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gui)
+    return gui, gui.QApplication.instance() or gui.QApplication(sys.argv[:1])
+
+
+def startup_time(script, marker, importtime=False):
+    """
+    Start a frontend and return the seconds until the marker appears on its stdout, and its -X importtime report.
+    The process is killed as soon as the marker was seen.
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + [script]
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr)
+        output = b''
+        while marker not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError(f'{script} exited before showing {marker!r}')
+            output += chunk
+        seconds = time.perf_counter() - start
+        process.kill()
+        process.wait()
+        stderr.seek(0)
+        return seconds, stderr.read().decode(errors='replace')
+
+
+def top_imports(report, count=8):
+    """The top-level imports of an -X importtime report with the largest cumulative time, as (ms, module)."""
+    imports = []
+    for line in report.splitlines():
+        if line.startswith('import time:') and not line.endswith('package'):
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if not name[1:].startswith(' '):  # nested imports are indented
+                imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def bench_startup(args):
+    """Time to the first prompt of main.py and to the shown window of main-gui.py, with the slowest imports."""
+    frontends = [('main.py', b'Enter your name', 'first prompt'), ('main-gui.py', b'window shown', 'window')]
+    for script, marker, what in frontends:
+        times = [startup_time(script, marker)[0] for _ in range(args.repeat)]
+        print(f'{script}: time to {what} mean {sum(times) / len(times):.3f} s, min {min(times):.3f} s')
+        for milliseconds, module in top_imports(startup_time(script, marker, importtime=True)[1]):
+            print(f'    {milliseconds:8.1f} ms  {module}')
+
+
+benchmarks = {
+    'backends': bench_backends,
+    'preview': bench_preview,
+    'text-cache': bench_text_cache,
+    'startup': bench_startup,
+    'import': bench_import,
+    'suggest': bench_suggest,
+    'locations': bench_locations,
+    'table': bench_table,
+    'worktime': bench_worktime,
+    'totals': bench_totals,
+    'modes': bench_modes,
+    'render': bench_render,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmark', choices=benchmarks)
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='repetitions after the warm-up run (default: 5)')
+    parser.add_argument('-r', '--rows', type=int, default=22, help='table rows of the synthetic payload (default: 22)')
+    parser.add_argument('-s', '--scales', type=float, nargs='+', default=[1.0, 0.25],
+                        help='render scales to compare (default: 1 0.25)')
+    parser.add_argument('--backends', nargs='+', choices=['raster', 'vector'], default=['raster', 'vector'],
+                        help='backends of the render suite (default: raster vector)')
+    parser.add_argument('-m', '--modes', nargs='+', choices=export.MODES, default=['RGB'],
+                        help='render modes of the render suite (default: RGB)')
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help='render suite: render the raster PDFs in bands with this memory budget (see export.py)')
+    parser.add_argument('--cold-cache', action='store_true',
+                        help='render suite: decode the template from the PNG instead of the raw cache')
+    parser.add_argument('-o', '--output', default='bench-render.json',
+                        help='JSON file of the render suite results, "-" for stdout (default: bench-render.json)')
+    parser.add_argument('--compare', metavar='FILE', help='render suite: compare with the results of an older run')
+    args = parser.parse_args(argv)
+    benchmarks[args.benchmark](args)
+
+
+if __name__ == '__main__':
+    main()
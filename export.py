@@ -1,38 +1,78 @@
+#!/usr/bin/env python
+import contextlib
 import datetime
+import functools
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
 
-from PIL import Image, ImageDraw, ImageFont
+from output_cache import OutputCache
+from profiling import stage
+from text_cache import TextCache
+
+# Pillow and the modules built on it are imported on first use, so that importing this module
+# (e.g. for the layout or at the start of a frontend) stays cheap
 
 # ========== paths ==========
 font_file = 'src/RobotoMono.ttf'
 template_file = 'src/template.png'
 empty_template_file = 'src/template_empty.png'
 
-# ========== fonts & positions ==========
+# ========== font sizes & positions ==========
+# (the fonts themselves are only loaded on first use, see get_font)
 # name field
 name_pos = (840, 965)
-name_font = ImageFont.truetype(font_file, 115)
+name_font_size = 115
 
 # IBAN field
 iban_pos = (1800, 1280)
-iban_font = name_font
+iban_font_size = name_font_size
 
 # month field
 month_pos = (500, 1910)
-month_font = name_font
+month_font_size = name_font_size
 
 # year field
 year_pos = (1610, 1930)
-year_font = ImageFont.truetype(font_file, 95)
+year_font_size = 95
 
 # table
-table_font = ImageFont.truetype(font_file, 118)
+table_font_size = 118
 table_x_positions = [230, 945, 1805, 2510]
 y_start = 2650
 y_delta = 185.3
+ROWS_PER_PAGE = 22  # longer tables continue on further pages, the total is written on the last one
 
 # total hour field
 hours_pos = (1790, 6795)
-hours_font = ImageFont.truetype(font_file, 160)
+hours_font_size = 160
+
+# largest accepted deviation (px) of a scaled layout from the full-size one
+LAYOUT_TOLERANCE = 2
+
+# ========== render modes ==========
+# RGB as the template, L (8 bit gray) or 1 (bilevel, text without anti-aliasing); the report is black on white,
+# so the gray modes hold the same page in a third of the memory and encode to much smaller PDFs
+MODES = ['RGB', 'L', '1']
+
+# ========== output ==========
+QUALITY = 50  # JPEG quality of the pages (and of the background of vector PDFs)
+# pixels per inch of the full-size template, which sets the page size of PDFs (4873x7391 pt at 72) at every scale
+DPI = 72
+# filters scaling the template to the render scale (see template_cache.build)
+RESAMPLE_FILTERS = ['nearest', 'box', 'bilinear', 'hamming', 'bicubic', 'lanczos']
+
+# ========== caches ==========
+text_cache = TextCache()
+# rendered reports by report_key, used by the frontends and the batch export unless disabled
+output_cache = OutputCache()
+RENDER_VERSION = 1  # part of report_key: raise it with every change of the rendered output
 
 # ========== german localizations ==========
 months_de = ['Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli',
@@ -40,53 +80,593 @@ months_de = ['Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli',
 weekdays_de = ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So']
 
 
-def time_str(seconds):
-    return f'{int(seconds // 3600):>2},{int((seconds % 3600) / 36):0<2}'
-
 def format_iban(iban):
     iban = iban.replace(' ', '').strip().upper()
     return ' '.join(iban[i:i+4] for i in range(0, len(iban), 4))
 
-def export_to_pdf(payload):
+def to_date(value):
+    """Accept a QDate, a datetime.date or an ISO 'YYYY-MM-DD' string."""
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date(year=value.year(), month=value.month(), day=value.day())
+
+
+def to_time(value):
+    """Accept a QTime, a datetime.time or an 'HH:MM' string."""
+    if isinstance(value, str):
+        hour, minute = value.split(':')
+        return datetime.time(hour=int(hour), minute=int(minute))
+    if isinstance(value, datetime.time):
+        return value
+    return datetime.time(hour=value.hour(), minute=value.minute())
+
+
+def plain_payload(payload):
+    """Return a copy of the payload holding only plain data (no QDate/QTime), e.g. to send it to another process."""
+    entries = [[to_date(date).isoformat(), to_time(start_time).strftime('%H:%M'), to_time(end_time).strftime('%H:%M'),
+                work_time, location]
+               for date, start_time, end_time, work_time, location in payload["entries"]]
+    return {**payload, "entries": entries}
+
+
+def load_template(use_template=True, scale=1.0, resample='box', mode='RGB'):
+    """
+    Load a template as image of the given mode (see MODES), ready to be drawn on (from the pre-rasterized cache
+    if possible). A scaled template is resampled with the named filter (see template_cache.build).
+    """
+    import template_cache
+    return template_cache.load(template_file if use_template else empty_template_file, mode, scale, resample)
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(use_template=True, scale=1.0, resample='box', mode='RGB'):
+    """Like load_template, but decodes each template only once per process (other threads wait for a running load)."""
+    with _templates_lock:
+        if (use_template, scale, resample, mode) not in _templates:
+            _templates[use_template, scale, resample, mode] = load_template(use_template, scale, resample, mode)
+        return _templates[use_template, scale, resample, mode]
+
+
+def template_ready(use_template=True, scale=1.0, resample='box', mode='RGB'):
+    return (use_template, scale, resample, mode) in _templates
+
+
+def preload(use_template=True, scale=1.0, resample='box', mode='RGB'):
+    """Load everything a render needs into the process-wide caches, e.g. on a background thread at startup."""
+    for size in (name_font_size, year_font_size, table_font_size, hours_font_size):
+        get_font(size * scale)
+    get_template(use_template, scale, resample, mode)
+
+
+def ink(mode):
+    """The black of the text in an image of the given mode."""
+    return (0, 0, 0) if mode == 'RGB' else 0
+
+
+@functools.lru_cache(maxsize=None)
+def get_background(use_template=True, scale=1.0, mode='RGB', resample='box', quality=QUALITY):
+    """
+    The (scaled) template encoded once per process as background of vector PDFs: as JPEG of the given quality in RGB
+    and L mode, bilevel templates losslessly with Flate. Returns the encoded bytes and the size in pixels.
+    """
+    img = get_template(use_template, scale, resample, mode)
+    buffer = io.BytesIO()
+    with stage('background encode'):
+        if mode == '1':
+            buffer.write(zlib.compress(img.tobytes()))
+        else:
+            img.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue(), img.size
+
+
+@functools.lru_cache(maxsize=None)
+def page_size(use_template=True):
+    """Size of the full-resolution template, which is also the page size in points at DPI."""
+    from PIL import Image
+    with Image.open(template_file if use_template else empty_template_file) as img:  # only reads the header
+        return img.size
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(size):
+    """The report font at the given (possibly fractional) size, loaded on first use."""
+    with stage('font load'):
+        from PIL import ImageFont
+        return ImageFont.truetype(font_file, size)
+
+
+def output_name(payload):
+    return f'job_log_{payload["month"]+1:0>2}_{str(payload["year"])[2:]}'
+
+
+def report_key(payload, fmt='pdf', scale=1.0, vector=False, mode='RGB', budget=None, title=None, quality=QUALITY,
+               dpi=DPI, resample='box'):
+    """
+    Key of the output cache for a report: the hash of the normalized payload (the work times are calculated from the
+    rows, so they are left out, the printed total is included), of the template and font files, of the renderer
+    version and of everything write_report is called with that changes the output, except the creation date.
+    """
+    import PIL
+    import template_cache
+    # the GUI sends the year as string, the other frontends and JSON payloads as number
+    fields = {'name': payload["name"], 'iban': format_iban(payload["iban"]), 'month': int(payload["month"]),
+              'year': int(payload["year"]), 'use_template': bool(payload["use_pdf_template"]),
+              'rows': [[date, start_time, end_time, location]
+                       for date, start_time, end_time, _, location in plain_payload(payload)["entries"]],
+              'total': total_minutes(payload),
+              'template': template_cache.file_hash(template_file if payload["use_pdf_template"] else
+                                                   empty_template_file),
+              'font': template_cache.file_hash(font_file), 'renderer': RENDER_VERSION, 'pillow': PIL.__version__,
+              'fmt': fmt, 'scale': scale, 'vector': vector, 'mode': mode, 'budget': budget, 'quality': quality,
+              'dpi': dpi, 'resample': resample,
+              'title': output_name(payload) if title is None else title}
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+    return f'{digest[:32]}.{fmt}'
+
+
+def entry_times(entries, first=0, stop=None):
+    """
+    Start and end minutes of the entries from first to stop (all by default) as arrays,
+    taken directly from the columns of a Rows object.
+    """
+    if hasattr(entries, 'times'):
+        return entries.times(first, stop)
+    import numpy as np
+    minutes = [[value.hour * 60 + value.minute for value in (to_time(start_time), to_time(end_time))]
+               for _, start_time, end_time, _, _ in entries[first:stop]]
+    return np.array(minutes, dtype=np.int64).reshape(-1, 2).T
+
+
+def page_count(payload):
+    """Number of pages the table of a payload fills, at least one."""
+    return max(1, -(-len(payload["entries"]) // ROWS_PER_PAGE))
+
+
+def total_minutes(payload):
+    """
+    Total work minutes written on a report: the payload's optional "total_minutes" (e.g. maintained by the GUI),
+    summed from the rows without it.
+    """
+    total = payload.get("total_minutes")
+    if total is None:
+        import worktime
+        total, _ = worktime.totals(*entry_times(payload["entries"]))
+    return int(total)
+
+
+def text_fields(payload, scale=1.0, page=0):
+    """
+    Everything that is written onto the given page of the template for a payload, as lists of
+    (position, text, font) tuples grouped by field: 'name', 'iban', 'month', 'year', 'row 0' ... 'row n'
+    (of this page) and, on the last page, 'hours' with the total of all pages (see total_minutes).
+    The positions and font sizes are scaled from the full template resolution by the given factor.
+    """
     # Extracting data from payload
     name = payload["name"]
     month = payload["month"]
     year = payload["year"]
     iban = payload["iban"]
-    use_template = payload["use_pdf_template"]
     entries = payload["entries"]
+    first_row = page * ROWS_PER_PAGE
+
+    last_page = page == page_count(payload) - 1
 
+    # the work times are calculated from the start and end times of all rows of the page at once
+    import worktime
+    starts, ends = entry_times(entries, first_row, first_row + ROWS_PER_PAGE)
+    work, _ = worktime.work_breaks(starts, ends)
     table = []
-    total_seconds = 0
-    for date, start_time, end_time, work_time, location in entries:
-        date = datetime.date(year=date.year(), month=date.month(), day=date.day())
-        start_time = datetime.time(hour=start_time.hour(), minute=start_time.minute())
-        end_time = datetime.time(hour=end_time.hour(), minute=end_time.minute())
-        secs = int(work_time[:2])*3600 + int(work_time[3:]) * 60
-        total_seconds += secs
+    for i in range(len(work)):
+        date, _, _, _, location = entries[first_row + i]
+        date = to_date(date)
         table.append((date.strftime('%d.%m. ') + weekdays_de[date.weekday()],
-                      start_time.strftime('%H:%M-') + end_time.strftime('%H:%M'),
-                      f"{time_str(secs)} hrs",
+                      f'{worktime.clock(starts[i])}-{worktime.clock(ends[i])}',
+                      f"{worktime.hours_str(work[i])} hrs",
                       location))
 
-    if use_template:
-        img = Image.open(template_file).convert('RGB')
+    fields = {'name': [(name_pos, name, name_font_size)],
+              'iban': [(iban_pos, format_iban(iban), iban_font_size)],
+              'month': [(month_pos, months_de[month], month_font_size)],
+              'year': [(year_pos, str(year)[2:], year_font_size)]}
+
+    for i, row in enumerate(table):
+        fields[f'row {i}'] = [((table_x_positions[column], y_start + y_delta * i), row[column], table_font_size)
+                              for column in range(4)]
+
+    if last_page:
+        fields['hours'] = [(hours_pos, f'{worktime.hours_str(total_minutes(payload))} h', hours_font_size)]
+    for key, items in fields.items():
+        if scale == 1:
+            fields[key] = [(position, text, get_font(size)) for position, text, size in items]
+        else:
+            fields[key] = [((x * scale, y * scale), text, get_font(size * scale)) for (x, y), text, size in items]
+    return fields
+
+
+def text_items(payload, scale=1.0, page=0):
+    """All items of text_fields in drawing order."""
+    return [item for items in text_fields(payload, scale, page).values() for item in items]
+
+
+def render(payload, template=None, scale=1.0, cache=text_cache, page=0, mode='RGB'):
+    """
+    Draw the given page of the payload onto a copy of the given (already decoded and scaled) template and return it.
+    With a scale other than 1 the page is rendered directly at that fraction of the template resolution.
+    The page has the mode of the template, mode only selects the template loaded without one.
+    The text is pasted from the given TextCache, or rasterized for every call with cache=None.
+    """
+    if template is None:
+        img = load_template(payload["use_pdf_template"], scale, mode=mode)
     else:
-        img = Image.open(empty_template_file).convert('RGB')
+        with stage('template copy'):
+            img = template.copy()
+    from PIL import ImageDraw
     template = ImageDraw.Draw(img)
+    fill = ink(img.mode)
 
     # writing the collected data to the image
-    template.text(name_pos, name, font=name_font, fill=(0, 0, 0))
-    template.text(iban_pos, format_iban(iban), font=iban_font, fill=(0, 0, 0))
-    template.text(month_pos, months_de[month], font=month_font, fill=(0, 0, 0))
-    template.text(year_pos, str(year)[2:], font=year_font, fill=(0, 0, 0))
+    with stage('text draw'):
+        for position, text, font in text_items(payload, scale, page):
+            if cache is None:
+                template.text(position, text, font=font, fill=fill)
+            else:
+                cache.draw(img, position, text, font, fill)
+    return img
 
-    for i, row in enumerate(table):
-        for column in range(4):
-            template.text((table_x_positions[column], y_start + y_delta * i), row[column], font=table_font, fill=(0, 0, 0))
-
-    template.text(hours_pos, f'{time_str(total_seconds)} h', font=hours_font, fill=(0, 0, 0))
-    output_fname = f'job_log_{month+1:0>2}_{str(year)[2:]}'
-    img.save(f'{output_fname}.pdf', quality=50)
-    # os.system(f'magick convert -scale 1218x1848 -compress JPEG -quality 90 {output_fname}.png {output_fname}.pdf')
-    # os.system(f'rm {output_fname}.png')
\ No newline at end of file
+
+def render_pages(payload, template=None, scale=1.0, cache=text_cache, mode='RGB', resample='box'):
+    """
+    All pages of the payload (see render), the template is decoded at most once (scaled with the named filter)
+    and copied for every page.
+    """
+    if template is None:
+        template = load_template(payload["use_pdf_template"], scale, resample, mode)
+    return [render(payload, template, scale, cache, page) for page in range(page_count(payload))]
+
+
+def render_bands(payload, height, scale=1.0, cache=text_cache, page=0, mode='RGB', resample='box'):
+    """
+    Render the given page band by band and yield it as (top row, image) bands of at most height rows, from top to
+    bottom: every band is read on its own from the template cache and only the text reaching into it is drawn on it,
+    so only a single band of the page is in memory at a time. The pixels of the bands are those of render;
+    text is always pasted as mask, cache=None only keeps the masks from being cached.
+    """
+    import template_cache
+    if cache is None:
+        # ImageDraw rounds positions above the band towards zero, a mask is placed exactly as on the whole page
+        cache = TextCache(maxsize=0)
+    # every text item with the rows it may cover (the bounding box of the text plus a row for sub-pixel offsets)
+    items = []
+    for (x, y), text, font in text_items(payload, scale, page):
+        _, top, _, bottom = font.getbbox(text)
+        items.append((y + top - 1, y + bottom + 1, (x, y), text, font))
+    fill = ink(mode)
+    fname = template_file if payload["use_pdf_template"] else empty_template_file
+    for top, band in template_cache.bands(fname, mode, scale, resample, height):
+        with stage('text draw'):
+            for first_row, last_row, (x, y), text, font in items:
+                if first_row < top + band.height and last_row >= top:
+                    cache.draw(band, (x, y - top), text, font, fill)
+        yield top, band
+
+
+def check_layout(payload, scale):
+    """
+    Compare the text boxes of a render at the given scale with those of the full-size render (scaled down), on all pages.
+    Returns the largest deviation in pixels of the scaled page. FreeType rounds every glyph advance to whole pixels,
+    so the right edge may additionally drift by up to half a pixel per character; that drift is not counted.
+    """
+    pages = range(page_count(payload))
+    full_items = [item for page in pages for item in text_items(payload, page=page)]
+    scaled_items = [item for page in pages for item in text_items(payload, scale, page)]
+    deviation = 0.0
+    for (full_pos, text, full_font), (pos, _, font) in zip(full_items, scaled_items):
+        full_box = [full_pos[i % 2] + edge for i, edge in enumerate(full_font.getbbox(text))]
+        box = [pos[i % 2] + edge for i, edge in enumerate(font.getbbox(text))]
+        left, top, right, bottom = (abs(full * scale - scaled) for full, scaled in zip(full_box, box))
+        deviation = max(deviation, left, top, max(0.0, right - len(text) / 2), bottom)
+    return deviation
+
+
+# output formats of write_report and the Pillow format writing them
+formats = {'pdf': 'PDF', 'png': 'PNG', 'jpeg': 'JPEG'}
+
+
+def write_report(payload, fp, fmt='pdf', template=None, created=None, scale=1.0, vector=False, progress=None,
+                 title=None, mode='RGB', budget=None, cache=None, quality=QUALITY, dpi=DPI, resample='box'):
+    """
+    Render the payload and write it in the given format ('pdf', 'png' or 'jpeg') to a binary file object,
+    which does not have to be seekable (e.g. sys.stdout.buffer or a pipe). The raster backend saves the rendered pages
+    as images, the vector backend (vector=True, PDF only) writes the text as real PDF text on top of the template
+    as background image, whose resolution is then set by the scale. Tables longer than ROWS_PER_PAGE continue on
+    further pages, which only PDFs can hold.
+    JPEG images are encoded with the given quality. The page size of PDFs is that of the full-size template at dpi
+    pixels per inch, whatever the scale; a template that is not passed is scaled with the named resample filter.
+    The pages are rendered in the mode of the template, or in the given mode (see MODES) without one. PDFs store
+    gray pages as gray JPEG and bilevel pages losslessly as CCITT G4 (Flate for the vector background).
+    With a memory budget (bytes, raster PDF only) the pages are rendered in bands (see render_bands) that are encoded
+    and written one by one, so that the page buffers take about budget bytes instead of the whole page and the
+    template argument is not used; every band is an image of its own (bilevel bands are Flate compressed).
+    With an OutputCache a report rendered before from the same data (see report_key) is copied from the cache instead,
+    seconds then only holds 'cache'; a copied report keeps the creation date of its first render.
+    A newly rendered report is stored in the cache while it is written.
+    progress(percent, stage) is called before every stage, an exception raised by it aborts the export.
+    Returns the number of bytes written and the seconds spent per stage ('render', 'encode', 'write').
+    """
+    if fmt not in formats or vector and fmt != 'pdf':
+        raise ValueError(f'cannot write {fmt!r} with the {"vector" if vector else "raster"} backend')
+    if budget is not None and (vector or fmt != 'pdf'):
+        raise ValueError('a memory budget is only supported for raster PDFs')
+    pages = page_count(payload)
+    if pages > 1 and fmt != 'pdf':
+        raise ValueError(f'{fmt!r} holds a single page, the report has {pages}')
+    progress = progress or (lambda percent, stage: None)
+    title = output_name(payload) if title is None else title
+    seconds = {}
+    start = time.perf_counter()
+    if cache is not None:
+        key = report_key(payload, fmt, scale, vector, mode, budget, title, quality, dpi, resample)
+        size = cache.copy(key, fp)
+        if size is not None:
+            return size, {'cache': time.perf_counter() - start}
+        with cache.storing(key, fp) as tee:
+            return write_report(payload, tee, fmt, template, created, scale, vector, progress, title, mode, budget,
+                                quality=quality, dpi=dpi, resample=resample)
+    if budget is not None:
+        progress(0, 'Writing PDF in bands')
+        import strip_pdf
+        import template_cache
+        use_template = payload["use_pdf_template"]
+        image_size = template_cache.scaled_size(page_size(use_template), scale)
+        height = strip_pdf.band_height(image_size[0], mode, budget)
+        bands = (render_bands(payload, height, scale, page=page, mode=mode, resample=resample) for page in range(pages))
+        points = tuple(length * 72 / dpi for length in page_size(use_template))
+        seconds = {'render': 0.0}
+        size = strip_pdf.write(fp, bands, pages, points, image_size, height, mode, title, created, quality, seconds)
+        seconds['render'] = time.perf_counter() - start - seconds['encode'] - seconds['write']
+        return size, seconds
+    buffer = io.BytesIO()
+    if vector:
+        progress(0, 'Writing PDF')
+        import vector_pdf
+        use_template = payload["use_pdf_template"]
+        background, background_size = get_background(use_template, scale, mode, resample, quality)
+        with stage('text draw'):
+            items = [text_items(payload, page=page) for page in range(pages)]
+        seconds['render'] = time.perf_counter() - start
+        with stage('encode'):
+            vector_pdf.write(buffer, background, background_size, page_size(use_template), items, font_file, title,
+                             created, mode, 72 / dpi)
+    else:
+        progress(0 if template is None else 30, 'Drawing text')
+        img, *more_pages = render_pages(payload, template, scale, mode=mode, resample=resample)
+        seconds['render'] = time.perf_counter() - start
+        progress(50, f'Saving {fmt.upper()}')
+        with stage('encode'):
+            if fmt == 'pdf':
+                # a fixed creation date (time.struct_time) makes the output reproducible, Pillow uses the current time
+                # otherwise; the page size is independent of the scale, only the pixel density changes
+                dates = {'creationDate': created, 'modDate': created} if created else {}
+                # bilevel pages are stored as CCITT G4, which takes no JPEG quality
+                jpeg = {} if img.mode == '1' else {'quality': quality}
+                img.save(buffer, 'PDF', resolution=dpi * scale, title=title, save_all=True, append_images=more_pages,
+                         **jpeg, **dates)
+            elif fmt == 'jpeg' and img.mode == '1':
+                img.convert('L').save(buffer, 'JPEG', quality=quality)
+            else:
+                img.save(buffer, formats[fmt], quality=quality)
+    seconds['encode'] = time.perf_counter() - start - seconds['render']
+    # Pillow's PDF writer seeks, so the report is encoded in memory and written to the stream in one go
+    start = time.perf_counter()
+    with stage('write'):
+        fp.write(buffer.getbuffer())
+        fp.flush()
+    seconds['write'] = time.perf_counter() - start
+    return buffer.getbuffer().nbytes, seconds
+
+
+@contextlib.contextmanager
+def replacing(fname):
+    """
+    Open a file for binary writing that replaces fname when the with block ends without an exception: the report is
+    written to a temporary file next to it, so that a failed or cancelled export leaves an existing fname untouched.
+    """
+    tmp_file = f'{fname}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_file, 'wb') as file:
+            yield file
+        os.replace(tmp_file, fname)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_file)
+        raise
+
+
+def export_to_pdf(payload, template=None, output_fname=None, created=None, scale=1.0, vector=False, progress=None,
+                  fmt='pdf', mode='RGB', budget=None, cache=None, quality=QUALITY, dpi=DPI, resample='box'):
+    """
+    Render the payload and save it as PDF (or in another format of write_report) to output_fname plus extension,
+    by default job_log_MM_YY.pdf in the current directory, or copy it from an OutputCache (see write_report).
+    The file is only replaced once the report is complete (see replacing). Returns the name of the written file.
+    """
+    output_fname = output_fname or output_name(payload)
+    with replacing(f'{output_fname}.{fmt}') as file:
+        write_report(payload, file, fmt, template, created, scale, vector, progress, os.path.basename(output_fname),
+                     mode, budget, cache, quality, dpi, resample)
+    return f'{output_fname}.{fmt}'
+
+
+def template_for(payload, fmt='pdf', scale=1.0, vector=False, mode='RGB', budget=None, title=None, cache=None,
+                 quality=QUALITY, dpi=DPI, resample='box'):
+    """
+    The decoded template (see get_template) to pass to write_report for a report, or None if it needs none:
+    the vector backend and rendering in bands read the template on their own, a report in the cache is copied.
+    """
+    if vector or budget is not None or cache is not None and \
+            report_key(payload, fmt, scale, vector, mode, budget, title, quality, dpi, resample) in cache:
+        return None
+    return get_template(payload["use_pdf_template"], scale, resample, mode)
+
+
+def _export_job(job):
+    """Render a single batch job, fonts and templates are only loaded once per (worker) process."""
+    payload, output_fname, options = job
+    start = time.perf_counter()
+    options = dict(options)
+    cache = output_cache if options.pop('use_cache') else None
+    template = template_for(payload, options['fmt'], options['scale'], options['vector'], options['mode'],
+                            options['budget'], os.path.basename(output_fname), cache, options['quality'],
+                            options['dpi'], options['resample'])
+    output_fname = export_to_pdf(payload, template, output_fname, cache=cache, **options)
+    return output_fname, time.perf_counter() - start, os.path.getsize(output_fname)
+
+
+def export_batch(payloads, per_person=True, workers=1, created=None, scale=1.0, vector=False, fmt='pdf', mode='RGB',
+                 budget=None, use_cache=False, quality=QUALITY, dpi=DPI, resample='box'):
+    """
+    Render every payload of an iterable (list or stream), decoding each template only once per process
+    (or band by band for every report with a memory budget per report, see write_report).
+    With use_cache, reports rendered before from the same data are copied from output_cache instead.
+    With workers > 1 the reports are rendered in a process pool; the output is byte-identical to the sequential path.
+    Yields (output file, seconds, bytes) for every report in input order as soon as it is written.
+    """
+    options = {'created': created or time.gmtime(), 'scale': scale, 'vector': vector, 'fmt': fmt, 'mode': mode,
+               'budget': budget, 'use_cache': use_cache, 'quality': quality, 'dpi': dpi, 'resample': resample}
+
+    def jobs():
+        for payload in payloads:
+            output_fname = output_name(payload)
+            if per_person:
+                output_fname = f'{re.sub(r"[^A-Za-z0-9]+", "_", payload["name"]).strip("_")}_{output_fname}'
+            yield plain_payload(payload), output_fname, options
+
+    if workers <= 1:
+        yield from map(_export_job, jobs())
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_export_job, jobs())
+
+
+def read_payloads(stream):
+    """Read payloads from a JSON list or from JSON Lines (one payload per line), lazily for the latter."""
+    first = stream.readline()
+    if first.lstrip().startswith('['):
+        yield from json.loads(first + stream.read())
+        return
+    if first.strip():
+        yield json.loads(first)
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Render timesheet reports from JSON payloads.')
+    parser.add_argument('files', nargs='*', default=['-'],
+                        help='JSON list or JSON Lines files with one payload each, "-" for stdin (default)')
+    parser.add_argument('--no-per-person', dest='per_person', action='store_false',
+                        help='name outputs job_log_MM_YY.pdf only (later reports of the same month overwrite earlier ones)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of worker processes, 0 for one per CPU core (default: 1)')
+    parser.add_argument('-s', '--scale', type=float, default=1.0,
+                        help='render directly at this fraction of the template resolution, e.g. 0.25 (default: 1)')
+    parser.add_argument('--vector', action='store_true',
+                        help='write the text as real (selectable) PDF text, the template is embedded as background image '
+                             'at --scale')
+    parser.add_argument('-f', '--format', choices=formats, default='pdf',
+                        help='output format, png and jpeg only with the raster backend (default: pdf)')
+    parser.add_argument('-m', '--mode', choices=MODES, default='RGB',
+                        help='render mode: RGB, L (gray) or 1 (black and white, stored as CCITT G4 in PDFs), the gray '
+                             'modes need a third of the memory and write much smaller files (default: RGB)')
+    parser.add_argument('-q', '--quality', type=int, default=QUALITY,
+                        help=f'JPEG quality of the pages (default: {QUALITY})')
+    parser.add_argument('--dpi', type=float, default=DPI,
+                        help=f'pixels per inch of the full-size template, sets the PDF page size at every scale, '
+                             f'e.g. 288 for 1218x1848 pt (default: {DPI})')
+    parser.add_argument('-r', '--resample', choices=RESAMPLE_FILTERS, default='box',
+                        help='filter scaling the template to --scale (default: box)')
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help='render the raster PDF in horizontal bands that are encoded and written one by one, so '
+                             'that the page buffers of every report (per worker) take about MB megabytes instead of '
+                             'the whole page')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write a single report to FILE instead, "-" for stdout (e.g. to pipe it into another job)')
+    parser.add_argument('--check-layout', action='store_true',
+                        help='only compare the layout at --scale with the full-size layout for every payload')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='always render, instead of copying reports rendered before from the same data from the '
+                             'output cache (see output_cache.py)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time spent in every render stage (template decode, font load, text draw, '
+                             'encode, ...) over all reports, needs -j 1')
+    args = parser.parse_args(argv)
+    if args.vector and args.format != 'pdf':
+        parser.error('--vector only writes pdf')
+    if args.memory_budget is not None and (args.vector or args.format != 'pdf'):
+        parser.error('--memory-budget only renders raster pdf')
+    budget = None if args.memory_budget is None else int(args.memory_budget * 2 ** 20)
+    if args.profile and args.workers != 1:
+        parser.error('--profile only times the stages of this process, use -j 1')
+    if args.profile:
+        import profiling
+        times = profiling.start()
+    cache = output_cache if args.use_cache else None
+
+    def payloads():
+        for fname in args.files:
+            if fname == '-':
+                yield from read_payloads(sys.stdin)
+            else:
+                with open(fname, encoding='utf-8') as file:
+                    yield from read_payloads(file)
+
+    if args.check_layout:
+        worst = max((check_layout(payload, args.scale) for payload in payloads()), default=0.0)
+        print(f'largest deviation from the full-size layout: {worst:.2f} px', file=sys.stderr)
+        sys.exit(worst > LAYOUT_TOLERANCE)
+
+    if args.output:
+        reports = iter(payloads())
+        payload = next(reports, None)
+        if payload is None or next(reports, None) is not None:
+            parser.error('--output takes exactly one report')
+        options = {'scale': args.scale, 'vector': args.vector, 'mode': args.mode, 'budget': budget,
+                   'quality': args.quality, 'dpi': args.dpi, 'resample': args.resample}
+        template = template_for(payload, args.format, cache=cache, **options)
+        if args.output == '-':
+            size, seconds = write_report(payload, sys.stdout.buffer, args.format, template, cache=cache, **options)
+        else:
+            with replacing(args.output) as file:
+                size, seconds = write_report(payload, file, args.format, template, cache=cache, **options)
+        print(f'{args.output}: {size / 1000:.1f} kB, ' + ', '.join(f'{name} {secs:.3f} s'
+                                                                 for name, secs in seconds.items()), file=sys.stderr)
+        if args.profile:
+            times.report()
+        return
+
+    count, total = 0, time.perf_counter()
+    for output_fname, seconds, size in export_batch(payloads(), args.per_person, args.workers or os.cpu_count(),
+                                                    scale=args.scale, vector=args.vector, fmt=args.format,
+                                                    mode=args.mode, budget=budget, use_cache=args.use_cache,
+                                                    quality=args.quality, dpi=args.dpi, resample=args.resample):
+        count += 1
+        print(f'{output_fname}: {seconds:.2f} s, {size / 1000:.1f} kB', file=sys.stderr)
+    total = time.perf_counter() - total
+    print(f'{count} report(s) in {total:.2f} s ({total / max(count, 1):.2f} s per report)', file=sys.stderr)
+    if args.workers == 1 and not args.vector:
+        print(f'text cache: {text_cache.hits} hits, {text_cache.misses} misses', file=sys.stderr)
+    if args.workers == 1 and args.use_cache:
+        print(f'output cache: {output_cache.hits} hits, {output_cache.misses} misses', file=sys.stderr)
+    if args.profile:
+        times.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -12,9 +12,9 @@
       deps = with pkgs; [
         #put dependencies here :)
       	python312
-	imagemagick
 	qt5Full
       ] ++ (with pkgs.python312Packages; [
+	numpy
 	pillow
 	pyqt5
       ]);
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+"""Validate CSV or JSON Lines timesheets without any prompts and render the valid reports."""
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from export import MODES, export_batch
+from worktime import clocks, work_breaks
+
+# ========== limits (the same as in the frontends) ==========
+MAX_INFO = 30
+
+# ========== input formats ==========
+# one CSV row per table row, the rows are grouped into one report per person and month (1-12)
+csv_columns = ['name', 'iban', 'year', 'month', 'date', 'start', 'end', 'info']
+# optional CSV column, 0/false/no renders the report on the empty template
+template_column = 'template'
+
+
+@functools.lru_cache(maxsize=None)
+def iban_error(iban):
+    """schwifty's reason for rejecting an IBAN, None if it is valid (checked once per distinct IBAN)."""
+    from schwifty import IBAN
+    from schwifty.exceptions import SchwiftyException
+    try:
+        IBAN(iban)
+    except SchwiftyException as error:
+        return str(error)
+    return None
+
+
+def new_sheet():
+    """An empty timesheet: a list of report headers and the table rows of all reports as columns."""
+    return [], {'report': [], 'line': [], 'date': [], 'start': [], 'end': [], 'info': []}
+
+
+def add_row(rows, report, line, date, start, end, info):
+    for column, value in zip(('report', 'line', 'date', 'start', 'end', 'info'), (report, line, date, start, end, info)):
+        rows[column].append(value)
+
+
+def read_csv(stream):
+    """Read a CSV timesheet (see csv_columns), returns the reports, the rows and the errors found while reading."""
+    reports, rows = new_sheet()
+    errors = []
+    reader = csv.DictReader(stream)
+    missing = [column for column in csv_columns if column not in (reader.fieldnames or [])]
+    if missing:
+        return reports, rows, [(1, f'missing column(s): {", ".join(missing)}')]
+    keys = {}
+    for record in reader:
+        line = reader.line_num
+        if None in record.values():
+            errors.append((line, 'too few columns'))
+            continue
+        record = {column: (value or '').strip() for column, value in record.items() if column is not None}
+        key = (record['name'], record['year'], record['month'])
+        if key not in keys:
+            keys[key] = len(reports)
+            reports.append({'line': line, 'name': record['name'], 'iban': record['iban'], 'year': record['year'],
+                            'month': record['month'],
+                            'use_pdf_template': record.get(template_column, '').lower() not in ('0', 'false', 'no')})
+        elif record['iban'] != reports[keys[key]]['iban']:
+            errors.append((line, f'IBAN differs from the one in line {reports[keys[key]]["line"]}'))
+            continue
+        add_row(rows, keys[key], line, record['date'], record['start'], record['end'], record['info'])
+    return reports, rows, errors
+
+
+def read_jsonl(stream):
+    """
+    Read export payloads (see export.py, the month is zero-based) from JSON Lines.
+    The work time of the entries is optional and recomputed from the start and end time.
+    """
+    reports, rows = new_sheet()
+    errors = []
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            payload = json.loads(text)
+            report = {'line': line, 'name': str(payload["name"]).strip(), 'iban': str(payload["iban"]).strip(),
+                      'year': str(payload["year"]), 'month': str(int(payload["month"]) + 1),
+                      'use_pdf_template': bool(payload.get("use_pdf_template", True))}
+            entries = [(entry[0], entry[1], entry[2], entry[-1]) for entry in payload["entries"]
+                       if len(entry) in (4, 5)]
+            if len(entries) != len(payload["entries"]):
+                raise ValueError('every entry has to be [date, from, to, (work time,) location]')
+        except (ValueError, KeyError, TypeError, IndexError) as error:
+            errors.append((line, f'invalid payload: {error}'))
+            continue
+        reports.append(report)
+        for date, start, end, info in entries:
+            add_row(rows, len(reports) - 1, line, str(date), str(start), str(end), str(info).strip())
+    return reports, rows, errors
+
+
+def parse_digits(values, width, separators):
+    """
+    Parse fixed-width strings of digits and separator characters at once.
+    Returns the digit codes as integer array (one column per character) and a mask of the well-formed values.
+    """
+    values = np.asarray(values, dtype=str)
+    codes = values.astype(f'U{width}').view(np.uint32).reshape(-1, width).astype(np.int64) - ord('0')
+    valid = np.char.str_len(values) == width
+    for position in range(width):
+        if position in separators:
+            valid &= codes[:, position] == ord(separators[position]) - ord('0')
+        else:
+            valid &= (codes[:, position] >= 0) & (codes[:, position] <= 9)
+    return codes, valid
+
+
+def parse_dates(values):
+    """ISO dates (YYYY-MM-DD) as year, month and day arrays plus a mask of the well-formed ones."""
+    codes, valid = parse_digits(values, 10, {4: '-', 7: '-'})
+    year = codes[:, 0] * 1000 + codes[:, 1] * 100 + codes[:, 2] * 10 + codes[:, 3]
+    return year, codes[:, 5] * 10 + codes[:, 6], codes[:, 8] * 10 + codes[:, 9], valid
+
+
+def parse_times(values):
+    """Times (H, HH, H:MM or HH:MM, as in main.py) in minutes since midnight plus a mask of the valid ones."""
+    values = np.asarray(values, dtype=str)
+    if not values.size:  # np.char.zfill fails on empty arrays
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    values = np.where(np.char.find(values, ':') < 0, np.char.add(values, ':00'), values)
+    codes, valid = parse_digits(np.char.zfill(values, 5), 5, {2: ':'})
+    hours, minutes = codes[:, 0] * 10 + codes[:, 1], codes[:, 3] * 10 + codes[:, 4]
+    return hours * 60 + minutes, valid & (hours < 24) & (minutes < 60)
+
+
+def days_in_month(year, month):
+    first = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    return ((first + 1).astype('datetime64[D]') - first.astype('datetime64[D]')).astype(np.int64)
+
+
+def validate(reports, rows):
+    """
+    Check all rows of a timesheet in one pass over its columns, and every report once.
+    Returns the payloads of the valid reports (in the format of export.py) and the errors as (line, message).
+    """
+    errors = []
+    report_ok = np.ones(len(reports), dtype=bool)
+
+    def report_error(index, message):
+        errors.append((reports[index]['line'], message))
+        report_ok[index] = False
+
+    # report fields, once per report
+    year = np.zeros(len(reports), dtype=np.int64)
+    month = np.ones(len(reports), dtype=np.int64)
+    for index, report in enumerate(reports):
+        if not report['name']:
+            report_error(index, 'name must not be empty')
+        if report['year'].isdigit() and 1970 <= int(report['year']) <= 9999:
+            year[index] = int(report['year'])
+        else:
+            report_error(index, f'invalid year {report["year"]!r}')
+        if report['month'].isdigit() and 1 <= int(report['month']) <= 12:
+            month[index] = int(report['month'])
+        else:
+            report_error(index, f'invalid month {report["month"]!r}, must be 1-12')
+        reason = iban_error(report['iban'].replace(' ', '').upper()) if report['iban'] else 'IBAN must not be empty'
+        if reason:
+            report_error(index, f'invalid IBAN {report["iban"]!r}: {reason}')
+
+    row_report = np.asarray(rows['report'], dtype=np.int64)
+    counts = np.bincount(row_report, minlength=len(reports))
+    for index in np.flatnonzero(counts == 0):
+        report_error(index, 'no entries')
+
+    # table rows, all at once
+    line = np.asarray(rows['line'], dtype=np.int64)
+    date_year, date_month, day, date_ok = parse_dates(rows['date'])
+    start, start_ok = parse_times(rows['start'])
+    end, end_ok = parse_times(rows['end'])
+    info_length = np.char.str_len(np.asarray(rows['info'], dtype=str))
+    in_month = (date_year == year[row_report]) & (date_month == month[row_report]) & (day >= 1) & \
+               (day <= days_in_month(year[row_report], month[row_report]))
+    checks = [
+        (~date_ok, 'invalid date, must be YYYY-MM-DD'),
+        (date_ok & ~in_month, 'date is not a day of the report\'s month'),
+        (~start_ok, 'invalid start time, must be HH or HH:MM'),
+        (~end_ok, 'invalid end time, must be HH or HH:MM'),
+        (start_ok & end_ok & (end <= start), 'end time has to be after the start time'),
+        (info_length == 0, 'job info must not be empty'),
+        (info_length > MAX_INFO, f'job info is longer than {MAX_INFO} characters'),
+    ]
+    row_ok = np.ones(len(line), dtype=bool)
+    for failed, message in checks:
+        errors.extend((int(row_line), message) for row_line in line[failed])
+        row_ok &= ~failed
+    report_ok &= np.bincount(row_report[~row_ok], minlength=len(reports)) == 0
+
+    work, _ = work_breaks(start, end)
+    start_clocks, end_clocks, work_clocks = clocks(start), clocks(end), clocks(work)
+    payloads = [{'name': report['name'], 'iban': report['iban'], 'month': int(month[index]) - 1,
+                 'year': int(year[index]), 'use_pdf_template': report['use_pdf_template'], 'entries': []}
+                if report_ok[index] else None for index, report in enumerate(reports)]
+    for index in np.flatnonzero(report_ok[row_report]):
+        payloads[row_report[index]]['entries'].append(
+            [rows['date'][index], start_clocks[index], end_clocks[index], work_clocks[index], rows['info'][index]])
+    return [payload for payload in payloads if payload], sorted(errors)
+
+
+def read_timesheet(fname):
+    """Read a .csv or JSON Lines file ("-" reads JSON Lines from stdin)."""
+    if fname == '-':
+        return read_jsonl(sys.stdin)
+    with open(fname, newline='', encoding='utf-8') as file:
+        return read_csv(file) if fname.lower().endswith('.csv') else read_jsonl(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('files', nargs='+', help='.csv files or JSON Lines files of export payloads, "-" for stdin')
+    parser.add_argument('--check', action='store_true', help='only validate, do not render anything')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of worker processes, 0 for one per CPU core (default: 1)')
+    parser.add_argument('-s', '--scale', type=float, default=1.0,
+                        help='render directly at this fraction of the template resolution (default: 1)')
+    parser.add_argument('--vector', action='store_true', help='write the text as real PDF text')
+    parser.add_argument('-m', '--mode', choices=MODES, default='RGB',
+                        help='render mode: RGB, L (gray) or 1 (black and white) (default: RGB)')
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help='render every report in bands whose buffers take about MB megabytes (raster only)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='render every report, also those found in the output cache')
+    args = parser.parse_args(argv)
+    if args.memory_budget is not None and args.vector:
+        parser.error('--memory-budget only renders with the raster backend')
+    budget = None if args.memory_budget is None else int(args.memory_budget * 2 ** 20)
+
+    valid, failed = [], 0
+    for fname in args.files:
+        start = time.perf_counter()
+        reports, rows, errors = read_timesheet(fname)
+        payloads, validation_errors = validate(reports, rows)
+        errors = sorted(errors + validation_errors)
+        seconds = time.perf_counter() - start
+        print(f'{fname}: {len(rows["line"])} rows, {len(payloads)}/{len(reports)} valid reports '
+              f'({len(rows["line"]) / max(seconds, 1e-9):.0f} rows/s)', file=sys.stderr)
+        for line, message in errors:
+            print(f'{fname}:{line}: {message}', file=sys.stderr)
+        valid.extend(payloads)
+        failed += bool(errors)
+
+    if not args.check:
+        for output_fname, seconds, size in export_batch(valid, workers=args.workers or os.cpu_count(),
+                                                        scale=args.scale, vector=args.vector, mode=args.mode,
+                                                        budget=budget, use_cache=args.use_cache):
+            print(f'{output_fname}: {seconds:.2f} s, {size / 1000:.1f} kB', file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,42 +1,307 @@
 #!/usr/bin/env python
+import functools
 import os.path
-import pickle
 import re
 import sys
-from schwifty import IBAN
+import threading
+import time
 
-from PyQt5.QtGui import QDoubleValidator
+START = time.perf_counter()
+
+from PyQt5.QtGui import QColor, QDoubleValidator, QImage, QPixmap
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QTableWidget, QTableWidgetItem, QComboBox, QLineEdit, QLabel,
-    QDateEdit, QTimeEdit, QCheckBox, QHeaderView
+    QTableView, QAbstractItemView, QStyledItemDelegate, QStyleOptionButton, QStyle, QComboBox, QLineEdit, QLabel,
+    QDateEdit, QTimeEdit, QCheckBox, QHeaderView, QProgressBar, QMessageBox, QCompleter
 )
-from PyQt5.QtCore import Qt, QTime, QDate
-from datetime import datetime
+from PyQt5.QtCore import (Qt, QTime, QDate, QEvent, QObject, QThread, QAbstractTableModel, QModelIndex,
+                          QStringListModel, pyqtSignal)
+from datetime import date, datetime
 
-from export import export_to_pdf
+from export import get_template, plain_payload, preload, template_ready, to_date
+import render_client
+from rows import Rows
+from worktime import clock, hours_str, work_break
+from store import Store
+from suggest import Suggestions
 
 # CONFIG
 MAX_INFO = 30
-MAX_TABLE_ENTRIES = 22
 MAX_LOCATIONS = 10
+MAX_SUGGESTIONS = 8  # locations offered by the completer while typing
+PREVIEW_WIDTH = 400
+PRELOAD = True  # decode the template on a background thread at startup instead of on first use
+
+WARNING_COLS = (QColor(Qt.yellow), QColor(Qt.black))  # background and text of a row that ends before it starts
+
+
+@functools.lru_cache(maxsize=None)
+def iban_class():
+    """schwifty's IBAN, imported on first use (loading its bank registry is slow)."""
+    from schwifty import IBAN
+    return IBAN
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportWorker(QObject):
+    """Renders and saves a report off the GUI thread. The payload has to be plain data (see export.plain_payload)."""
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(str, float)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, payload):
+        super().__init__()
+        self.payload = payload
+        self.cancel_requested = False
+
+    def cancel(self):
+        """Request cancellation, which takes effect before the next export stage."""
+        self.cancel_requested = True
 
-WARNING_COLS = lambda palette: (Qt.yellow, Qt.black)
-DEFAULT_COLS = lambda palette: (palette.color(palette.Base), palette.color(palette.Text))
+    def report(self, percent, stage):
+        if self.cancel_requested:
+            raise ExportCancelled()
+        self.progress.emit(percent, stage)
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            # on the render service if one runs, otherwise here (an unchanged report is copied from the output cache)
+            output_fname = render_client.export_to_pdf(self.payload, progress=self.report)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(os.path.abspath(output_fname), time.perf_counter() - start)
+
+
+class TableModel(QAbstractTableModel):
+    """
+    The rows of the table, kept column by column in a Rows object that the export reads directly.
+    Date, times and location are edited through the delegates, work and break time are calculated from the times.
+    """
+    headers = ["Date", "From", "To", "Work Time", "Break Time", "Location", None]
+
+    def __init__(self, year, month):
+        super().__init__()
+        self.rows = Rows()
+        self.year, self.month = year, month
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        if index.column() in (0, 1, 2, 5):
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+        if index.column() == 4 and not self.break_minutes(index.row()):
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled
+
+    def break_minutes(self, row):
+        return work_break(self.rows.starts[row], self.rows.ends[row])[1]
+
+    def data(self, index, role=Qt.DisplayRole):
+        row, column = index.row(), index.column()
+        rows = self.rows
+        if role == Qt.EditRole:
+            if column == 0:
+                date = rows.date(row)
+                return QDate(date.year, date.month, date.day)
+            if column in (1, 2):
+                minutes = (rows.starts if column == 1 else rows.ends)[row]
+                return QTime(minutes // 60, minutes % 60)
+            if column == 5:
+                return rows.locations[row]
+        elif role == Qt.DisplayRole:
+            if column == 0:
+                return rows.date(row).strftime('%d.%m.%Y')
+            if column in (1, 2):
+                return clock((rows.starts if column == 1 else rows.ends)[row])
+            if column in (3, 4):
+                return clock(work_break(rows.starts[row], rows.ends[row])[column - 3])
+            if column == 5:
+                return rows.locations[row]
+            if column == 6:
+                return "Delete"
+        elif column == 3 and role in (Qt.BackgroundRole, Qt.ForegroundRole) and rows.ends[row] <= rows.starts[row]:
+            return WARNING_COLS[role == Qt.ForegroundRole]
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        row, column = index.row(), index.column()
+        rows = self.rows
+        if column == 0:
+            value = to_date(value).toordinal()
+            if rows.dates[row] == value:
+                return True
+            rows.dates[row] = value
+        elif column in (1, 2):
+            value = value.hour() * 60 + value.minute()
+            times = [rows.starts[row], rows.ends[row]]
+            if times[column - 1] == value:
+                return True
+            times[column - 1] = value
+            # the totals are updated by the change of this row, the times change work and break time as well
+            rows.set_times(row, *times)
+            index = self.index(row, 4)
+        elif column == 5:
+            if rows.locations[row] == value:
+                return True
+            rows.set_location(row, value)
+        else:
+            return False
+        self.dataChanged.emit(self.index(row, column), index)
+        return True
+
+    def first_of_month(self):
+        return date(self.year, self.month, 1)
+
+    def append_row(self, location=''):
+        """Add a row on the first of the month from 12:00 to 12:00."""
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows))
+        self.rows.append(self.first_of_month(), 12 * 60, 12 * 60, location)
+        self.endInsertRows()
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.rows.remove(row)
+        self.endRemoveRows()
+
+    def set_entries(self, entries):
+        """Replace all rows with plain [date, from, to, work time, location] entries."""
+        self.beginResetModel()
+        self.rows.clear()
+        self.rows.extend(entries)
+        self.endResetModel()
+
+    def set_month(self, year, month):
+        """Select another month, all rows are moved to its first day."""
+        self.year, self.month = year, month
+        if self.rows:
+            self.rows.set_dates(self.first_of_month())
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.rows) - 1, 0))
+
+
+class DateDelegate(QStyledItemDelegate):
+    """Edits a date with a calendar popup, restricted to the month of the model."""
+
+    def createEditor(self, parent, option, index):
+        model = index.model()
+        first = QDate(model.year, model.month, 1)
+        editor = QDateEdit(parent)
+        editor.setCalendarPopup(True)
+        editor.setDateRange(first, first.addDays(first.daysInMonth() - 1))
+        # every change is committed at once, so that the preview follows the editor
+        editor.dateChanged.connect(lambda _: self.commitData.emit(editor))
+        return editor
+
+
+class TimeDelegate(QStyledItemDelegate):
+
+    def createEditor(self, parent, option, index):
+        editor = QTimeEdit(parent)
+        editor.setDisplayFormat("HH:mm")
+        editor.timeChanged.connect(lambda _: self.commitData.emit(editor))
+        return editor
+
+
+class LocationDelegate(QStyledItemDelegate):
+    """
+    Edits a location in a combo box over the shared list of recent locations, completed from the suggestions.
+    finished(combo) is called when the editing of a location is finished.
+    """
+
+    def __init__(self, locations_model, completion_model, update_completions, finished, parent=None):
+        super().__init__(parent)
+        self.locations_model = locations_model
+        self.completion_model = completion_model
+        self.update_completions = update_completions
+        self.finished = finished
+
+    def createEditor(self, parent, option, index):
+        combo = QComboBox(parent)
+        combo.setModel(self.locations_model)
+        combo.setEditable(True)
+        combo.setInsertPolicy(QComboBox.NoInsert)  # the shared list is only changed by update_locations
+        combo.lineEdit().setMaxLength(MAX_INFO)
+        # the completions have to be updated before the completer shows them
+        combo.lineEdit().textEdited.connect(self.update_completions)
+        completer = QCompleter(self.completion_model, combo)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        combo.setCompleter(completer)
+        combo.lineEdit().editingFinished.connect(lambda: self.finished(combo))
+        combo.editTextChanged.connect(lambda _: self.commitData.emit(combo))
+        return combo
+
+    def setEditorData(self, combo, index):
+        # every edit is committed at once and comes back here, setting the same text again would move the cursor
+        if combo.currentText() != index.data(Qt.EditRole):
+            combo.setEditText(index.data(Qt.EditRole))
+
+    def setModelData(self, combo, model, index):
+        model.setData(index, combo.currentText())
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """Draws the text of a cell as push button, clicked(row) is emitted when it is clicked."""
+    clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect
+        button.text = index.data()
+        button.state = QStyle.State_Enabled
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and option.rect.contains(event.pos()):
+            self.clicked.emit(index.row())
+            return True
+        return False
 
 
 class TimeTrackingApp(QWidget):
-    def __init__(self, config):
+    preloaded = pyqtSignal(bool)
+
+    def __init__(self, config, preload=PRELOAD, store=None):
         super().__init__()
+        self.store = store
         self.setWindowTitle("Explorhino TimeTracker")
-        self.resize(950, 600)
-
-        self.locations_list = config['locations']
+        self.resize(950 + PREVIEW_WIDTH, 650)
+
+        # recently used locations, most recent first, shown by the combo boxes of all rows
+        self.locations_model = QStringListModel(config['locations'])
+        # locations ranked by their decaying number of uses, completed while typing
+        self.suggestions = Suggestions()
+        for location, count, last_used in (store.job_infos() if store is not None else []):
+            self.suggestions.add(location, max(count, 1), last_used)
+        for location in config['locations']:
+            if location not in self.suggestions:
+                self.suggestions.add(location)
+        self.completion_model = QStringListModel()
 
         self.layout = QVBoxLayout(self)
         self.init_extra_fields(config)
         self.init_table()
+        self.init_preview(preload)
         self.add_row()  # Add an initial row
+        self.exports = 0
 
     def init_extra_fields(self, config):
         """Initialize extra fields layout."""
@@ -46,6 +311,7 @@ class TimeTrackingApp(QWidget):
         # Name
         self.extra_fields_layout.addWidget(QLabel("Name:"))
         self.name_input = QLineEdit(config['name'])
+        self.name_input.textChanged.connect(self.update_preview)
         self.extra_fields_layout.addWidget(self.name_input)
 
         # Month
@@ -57,6 +323,7 @@ class TimeTrackingApp(QWidget):
         prev_month = (datetime.now().month - 2) % 12
         self.month_combo.setCurrentIndex(prev_month)
         self.month_combo.currentIndexChanged.connect(self.update_all_row_months)
+        self.month_combo.currentIndexChanged.connect(self.update_preview)  # also without rows
         self.extra_fields_layout.addWidget(self.month_combo)
 
         # Year
@@ -66,6 +333,9 @@ class TimeTrackingApp(QWidget):
         years = [str(current_year), str(current_year - 1), str(current_year - 2)]
         self.year_combo.addItems(years)
         self.year_combo.setCurrentIndex(datetime.now().month == 1)
+        # the model keeps the selected month, its rows and the date editors follow the year too
+        self.year_combo.currentIndexChanged.connect(self.update_all_row_months)
+        self.year_combo.currentIndexChanged.connect(self.update_preview)
         self.extra_fields_layout.addWidget(self.year_combo)
 
         # IBAN
@@ -77,175 +347,158 @@ class TimeTrackingApp(QWidget):
         # Use PDF Template
         self.use_pdf_checkbox = QCheckBox("Use PDF Template")
         self.use_pdf_checkbox.setChecked(config['use_template'])
+        self.use_pdf_checkbox.toggled.connect(self.update_preview)
         self.extra_fields_layout.addWidget(self.use_pdf_checkbox)
 
     def init_table(self):
         """Initialize table layout."""
-        self.table = QTableWidget()
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels(["Date", "From", "To", "Work Time", "Break Time", "Location", None])
-        self.layout.addWidget(self.table)
+        self.model = TableModel(int(self.year_combo.currentText()), self.month_combo.currentIndex() + 1)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        # the editors are only created while a cell is edited, a single click starts editing
+        self.table.setEditTriggers(QAbstractItemView.AllEditTriggers)
+        self.table.setItemDelegateForColumn(0, DateDelegate(self.table))
+        time_delegate = TimeDelegate(self.table)
+        self.table.setItemDelegateForColumn(1, time_delegate)
+        self.table.setItemDelegateForColumn(2, time_delegate)
+        self.table.setItemDelegateForColumn(5, LocationDelegate(self.locations_model, self.completion_model,
+                                                                self.update_completions, self.update_locations,
+                                                                self.table))
+        delete_delegate = ButtonDelegate(self.table)
+        delete_delegate.clicked.connect(self.remove_row)
+        self.table.setItemDelegateForColumn(6, delete_delegate)
+        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
+        for signal in (self.model.dataChanged, self.model.rowsInserted, self.model.rowsRemoved, self.model.modelReset):
+            signal.connect(lambda *_: self.update_preview())
+        self.table_layout = QHBoxLayout()
+        self.table_layout.addWidget(self.table)
+        self.layout.addLayout(self.table_layout)
+
+        # Totals of all rows, updated by every change of a row
+        self.totals_label = QLabel()
+        self.layout.addWidget(self.totals_label)
+        for signal in (self.model.dataChanged, self.model.rowsInserted, self.model.rowsRemoved, self.model.modelReset):
+            signal.connect(lambda *_: self.update_totals())
 
         # Buttons
         self.add_row_button = QPushButton("Add Row")
         self.add_row_button.clicked.connect(self.add_row)
         self.layout.addWidget(self.add_row_button)
 
+        self.export_layout = QHBoxLayout()
+        self.layout.addLayout(self.export_layout)
         self.export_button = QPushButton("Export")
         self.export_button.clicked.connect(self.export_data)
-        self.layout.addWidget(self.export_button)
+        self.export_layout.addWidget(self.export_button)
+
+        self.export_progress = QProgressBar()
+        self.export_progress.setFormat("%p%")
+        self.export_progress.hide()
+        self.export_layout.addWidget(self.export_progress)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_export)
+        self.cancel_button.hide()
+        self.export_layout.addWidget(self.cancel_button)
+        self.export_thread = None
+
+    def init_preview(self, preload):
+        """Initialize the live preview next to the table, loading the template in the background if requested."""
+        self.preview = None
+        self.preview_label = QLabel()
+        self.preview_label.setFixedWidth(PREVIEW_WIDTH)
+        self.preview_label.setAlignment(Qt.AlignTop)
+        self.table_layout.addWidget(self.preview_label)
+
+        self.preloading = set()
+        self.preloaded.connect(self.update_preview)
+        if preload:
+            self.start_preload(self.use_pdf_checkbox.isChecked())
+
+    def start_preload(self, use_template):
+        """Load a template on a background thread, preloaded is emitted when it is ready."""
+        if use_template in self.preloading:
+            return
+        self.preloading.add(use_template)
+
+        def run():
+            preload(use_template)
+            print(f"[timing] {'template' if use_template else 'empty template'} ready after "
+                  f"{time.perf_counter() - START:.2f} s")
+            self.preloaded.emit(use_template)
+            iban_class()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def update_preview(self):
+        """Redraw the changed fields of the preview page and show it."""
+        use_template = self.use_pdf_checkbox.isChecked()
+        if self.preview is None or self.preview_template != use_template:
+            if self.preloading and not template_ready(use_template):
+                self.start_preload(use_template)
+                self.preview_label.setText("Loading preview...")
+                return
+            from preview import PagePreview
+            self.preview = PagePreview(get_template(use_template), PREVIEW_WIDTH)
+            self.preview_template = use_template
+        self.preview.update(self.payload())
+
+        display = self.preview.display
+        image = QImage(display.tobytes(), display.width, display.height, 3 * display.width, QImage.Format_RGB888)
+        self.preview_label.setPixmap(QPixmap.fromImage(image))
 
     def add_row(self):
-        """Add a new row with default values."""
-        row_position = self.table.rowCount()
-        self.table.insertRow(row_position)
-
-        # Date default to first of selected month and restricted to that month
-        selected_month = self.month_combo.currentIndex() + 1
-        selected_year = int(self.year_combo.currentText())
-        first_of_month = QDate(selected_year, selected_month, 1)
-        date_input = QDateEdit(first_of_month)
-        date_input.setCalendarPopup(True)
-
-        # Set min and max date to the selected month
-        max_day = QDate(selected_year, selected_month, 1).daysInMonth()
-        date_input.setMinimumDate(QDate(selected_year, selected_month, 1))
-        date_input.setMaximumDate(QDate(selected_year, selected_month, max_day))
-
-        self.table.setCellWidget(row_position, 0, date_input)
-
-        # Time From/To default to 12:00
-        time_from_input = QTimeEdit(QTime(12, 0))
-        time_from_input.setDisplayFormat("HH:mm")
-        self.table.setCellWidget(row_position, 1, time_from_input)
-        time_from_input.timeChanged.connect(lambda _: self.update_timings(row_position))
-
-        time_to_input = QTimeEdit(QTime(12, 0))
-        time_to_input.setDisplayFormat("HH:mm")
-        self.table.setCellWidget(row_position, 2, time_to_input)
-        time_to_input.timeChanged.connect(lambda _: self.update_timings(row_position))
-
-        # Spent Time
-        spent_time_item = QTableWidgetItem("00:00")
-        spent_time_item.setFlags(Qt.ItemIsEnabled)
-        self.table.setItem(row_position, 3, spent_time_item)
-
-        # Spent Time
-        spent_time_item = QTableWidgetItem("00:00")
-        spent_time_item.setFlags(Qt.ItemIsEnabled)
-        self.table.setItem(row_position, 4, spent_time_item)
-
-        # Location dropdown
-        location_combo = QComboBox()
-        location_combo.addItems(self.locations_list)
-        location_combo.setEditable(True)
-        location_combo.lineEdit().setMaxLength(MAX_INFO)
-        location_combo.lineEdit().editingFinished.connect(lambda combo=location_combo: self.update_locations(combo))
-        self.table.setCellWidget(row_position, 5, location_combo)
-
-        # Delete button
-        delete_button = QPushButton("Delete")
-        delete_button.clicked.connect(lambda _, button=delete_button: self.remove_row(button))
-        self.table.setCellWidget(row_position, 6, delete_button)
-        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
+        """Add a new row on the first of the selected month, at the most recently used location."""
+        locations = self.locations_model.stringList()
+        self.model.append_row(locations[0] if locations else '')
 
-        # Determine if add row is greyed out
-        if self.table.rowCount() >= MAX_TABLE_ENTRIES:
-            self.add_row_button.setDisabled(True)
-        else:
-            self.add_row_button.setDisabled(False)
+    def update_totals(self):
+        """Show the totals the rows keep up to date, the locations with the most work first."""
+        totals = self.model.rows.totals
+        by_work = sorted(totals.locations.items(), key=lambda item: -item[1][0])
+        locations = ', '.join(f'{location or "?"} {hours_str(minutes).strip()} h' for location, (minutes, _) in by_work)
+        self.totals_label.setText(f"Total: {hours_str(totals.work).strip()} h of work, {clock(totals.breaks)} breaks"
+                                  + (f" ({locations})" if locations else ""))
 
-        self.update_timings(row_position)
+    def update_completions(self, text):
+        self.completion_model.setStringList(self.suggestions.top(text.strip(), MAX_SUGGESTIONS))
 
     def update_locations(self, combo):
-        location_combos = [self.table.cellWidget(row, 5) for row in range(self.table.rowCount())]
-
+        """Move the entered location to the top of the shared list, a single change that every row's combo box sees."""
         entry = combo.currentText().strip()
         if not entry:
             return
 
-        if entry in self.locations_list:
-            self.locations_list.remove(entry)
-        self.locations_list.insert(0, combo.currentText())
-
-        for combo_box in location_combos:
-            c_text = combo_box.lineEdit().text()
-            combo_box.clear()
-            combo_box.addItems(self.locations_list)
-            combo_box.lineEdit().setText(c_text)
-
-    def update_timings(self, row):
-        """Calculate and update spent time for a given row."""
-        palette = self.table.palette()
-        from_widget = self.table.cellWidget(row, 1)
-        to_widget = self.table.cellWidget(row, 2)
-        time_from = from_widget.time()
-        time_to = to_widget.time()
-
-        from_minutes = time_from.hour() * 60 + time_from.minute()
-        to_minutes = time_to.hour() * 60 + time_to.minute()
-
-        work_minutes = (to_minutes - from_minutes)
-        if work_minutes <= 0:
-            self.table.item(row, 3).setBackground(WARNING_COLS(palette)[0])
-            self.table.item(row, 3).setForeground(WARNING_COLS(palette)[1])
-        else:
-            self.table.item(row, 3).setBackground(DEFAULT_COLS(palette)[0])
-            self.table.item(row, 3).setForeground(DEFAULT_COLS(palette)[1])
-        work_minutes %= (24 * 60)
-
-        if work_minutes > 9 * 60:
-            break_minutes = 45
-        elif work_minutes > 6 * 60:
-            break_minutes = 30
-        else:
-            break_minutes = 0
+        matches = self.locations_model.match(self.locations_model.index(0), Qt.DisplayRole, entry, 1,
+                                             Qt.MatchExactly | Qt.MatchCaseSensitive)
+        if not matches:
+            self.locations_model.insertRows(0, 1)
+            self.locations_model.setData(self.locations_model.index(0), entry)
+        elif matches[0].row() > 0:
+            self.locations_model.moveRows(QModelIndex(), matches[0].row(), 1, QModelIndex(), 0)
+        self.suggestions.add(entry)
+        if self.store is not None:
+            self.store.use_job_info(entry)
 
-        hours, minutes = divmod(work_minutes - break_minutes, 60)
-        self.table.item(row, 3).setText(f"{hours:02}:{minutes:02}")
-        hours, minutes = divmod(break_minutes, 60)
-        self.table.item(row, 4).setText(f"{hours:02}:{minutes:02}")
+    def remove_row(self, row):
+        self.model.remove_row(row)
 
-        if break_minutes:
-            self.table.item(row, 4).setFlags(Qt.ItemIsEnabled)
-        else:
-            self.table.item(row, 4).setFlags(Qt.NoItemFlags)
-
-    def remove_row(self, button):
-        for row in range(self.table.rowCount()):
-            if self.table.cellWidget(row, 6) == button:
-                self.table.removeRow(row)
-                if self.table.rowCount() >= MAX_TABLE_ENTRIES:
-                    self.add_row_button.setDisabled(True)
-                else:
-                    self.add_row_button.setDisabled(False)
-                return
-        else:
-            print("No row found")
+    def load_rows(self, entries):
+        """Replace the rows with saved [date, from, to, work time, location] entries (see export.plain_payload)."""
+        self.model.set_entries(entries)
 
     def update_all_row_months(self):
-        """Update all rows' dates to the first of the selected month."""
-        selected_month = self.month_combo.currentIndex() + 1
-        selected_year = int(self.year_combo.currentText())
-        max_day = QDate(selected_year, selected_month, 1).daysInMonth()
-
-        for row in range(self.table.rowCount()):
-            date_widget = self.table.cellWidget(row, 0)
-            if date_widget:
-                # Set date to first of month
-                new_date = QDate(selected_year, selected_month, 1)
-                date_widget.setDate(new_date)
-                date_widget.setMinimumDate(QDate(selected_year, selected_month, 1))
-                date_widget.setMaximumDate(QDate(selected_year, selected_month, max_day))
+        """Update all rows' dates to the first of the selected month and year."""
+        self.model.set_month(int(self.year_combo.currentText()), self.month_combo.currentIndex() + 1)
 
     def check_iban(self):
         """Check if IBAN is valid."""
 
         iban = self.iban_input.text().strip()
         try:
-            IBAN(self.iban_input.text().strip())
+            iban_class()(self.iban_input.text().strip())
             self.iban_input.setStyleSheet("")
-            self.export_button.setDisabled(False)
+            self.export_button.setDisabled(self.export_thread is not None)
         except:
             self.iban_input.setStyleSheet("background-color: red")
             self.iban_input.setToolTip("That does not look like a valid IBAN ._. Check again.")
@@ -258,50 +511,100 @@ class TimeTrackingApp(QWidget):
         self.iban_input.blockSignals(True)
         self.iban_input.setText(iban)
         self.iban_input.blockSignals(False)
+        self.update_preview()
 
-    def export_data(self):
-        entries = []
-        for row in range(self.table.rowCount()):
-            data = [self.table.cellWidget(row, 0).date(),
-                    self.table.cellWidget(row, 1).time(),
-                    self.table.cellWidget(row, 2).time(),
-                    self.table.item(row, 3).text(),
-                    self.table.cellWidget(row, 5).currentText()]
-            entries.append(data)
-            print(f"- Date: {data[0]}, From: {data[1]}, To: {data[2]}, Spent: {data[3]}, Location: {data[4]}")
-
-        payload = {
+    def payload(self):
+        """Collect the data of all fields and rows for the export."""
+        return {
             "name": self.name_input.text(),
             "month": self.month_combo.currentIndex(),
             "year": self.year_combo.currentText(),
             "iban": self.iban_input.text(),
             "use_pdf_template": self.use_pdf_checkbox.isChecked(),
-            "entries": entries
+            "entries": self.model.rows,
+            "total_minutes": self.model.rows.totals.work
         }
+
+    def save(self):
+        """Save the profile and the rows of the selected month to the store."""
+        if self.store is None:
+            return
+        payload = plain_payload(self.payload())
+        self.store.save_profile(payload["name"], payload["iban"], payload["use_pdf_template"])
+        self.store.save_rows(payload["name"], payload["year"], payload["month"] + 1, payload["entries"])
+
+    def export_data(self):
+        """Collect the payload on the GUI thread and export it on a worker thread."""
+        self.save()
+        payload = plain_payload(self.payload())
+        for data in payload["entries"]:
+            print(f"- Date: {data[0]}, From: {data[1]}, To: {data[2]}, Spent: {data[3]}, Location: {data[4]}")
         print(payload)
-        export_to_pdf(payload)
+        self.export_preloaded = template_ready(payload["use_pdf_template"])
+
+        self.export_thread = QThread()
+        self.export_worker = ExportWorker(payload)
+        self.export_worker.moveToThread(self.export_thread)
+        self.export_thread.started.connect(self.export_worker.run)
+        self.export_worker.progress.connect(self.export_progressed)
+        self.export_worker.finished.connect(self.export_finished)
+        self.export_worker.failed.connect(self.export_failed)
+        for signal in (self.export_worker.finished, self.export_worker.failed, self.export_worker.cancelled):
+            signal.connect(self.export_thread.quit)
+        self.export_thread.finished.connect(self.export_done)
+
+        self.export_button.setDisabled(True)
+        self.export_progress.setValue(0)
+        self.export_progress.show()
+        self.cancel_button.show()
+        self.export_thread.start()
+
+    def cancel_export(self):
+        # called directly on the GUI thread, the worker's own event loop is blocked while it renders
+        self.export_worker.cancel()
+
+    def export_progressed(self, percent, stage):
+        self.export_progress.setValue(percent)
+        self.export_progress.setFormat(f"%p% {stage}")
+
+    def export_finished(self, output_fname, seconds):
+        self.exports += 1
+        if self.exports == 1:
+            print(f"[timing] first export took {seconds:.2f} s (template preloaded: {self.export_preloaded})")
+        QMessageBox.information(self, "Export done", f"Saved {output_fname}\nin {seconds:.1f} s.")
+
+    def export_failed(self, message):
+        QMessageBox.critical(self, "Export failed", message)
+
+    def export_done(self):
+        """Clean up after the worker thread ended (finished, failed or cancelled)."""
+        self.export_thread.deleteLater()
+        self.export_worker.deleteLater()
+        self.export_thread = self.export_worker = None
+        self.export_progress.hide()
+        self.cancel_button.hide()
+        self.check_iban()
+
+    def closeEvent(self, event):
+        if self.export_thread is not None:
+            self.export_worker.cancel()
+            self.export_thread.wait()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
-    if os.path.exists('entries.tmp'):
-        with open('entries.tmp', 'rb') as savefile:
-            config = pickle.load(savefile)
-    else:
-        config = {
-            'name': 'Max Mustermann',
-            'iban': '',
-            'use_template': True,
-            'locations': []
-        }
+    # profile, recently used locations and past rows (the entries.tmp of older versions is imported on first run)
+    store = Store()
+    config = {'name': 'Max Mustermann', 'iban': '', 'use_template': True}
+    config.update((key, value) for key, value in (store.profile() or {}).items() if value != '')
+    config['locations'] = [location for location, _, _ in store.job_infos('recent', MAX_LOCATIONS)]
     app = QApplication(sys.argv)
-    window = TimeTrackingApp(config=config)
+    window = TimeTrackingApp(config=config, store=store)
+    entries = store.rows(config['name'], window.year_combo.currentText(), window.month_combo.currentIndex() + 1)
+    if entries:
+        window.load_rows(entries)
     window.show()
+    print(f"[timing] window shown after {time.perf_counter() - START:.2f} s", flush=True)
     app.exec_()
-    with open('entries.tmp', 'wb') as savefile:
-        config = {
-            'name': window.name_input.text(),
-            'iban': window.iban_input.text(),
-            'use_template': window.use_pdf_checkbox.isChecked(),
-            'locations': window.locations_list[:MAX_LOCATIONS]
-        }
-        pickle.dump(config, savefile)
+    window.save()
+    store.close()
@@ -1,11 +1,21 @@
 #!/usr/bin/env python
 import os
-import pickle
 import platform
 import re
+import threading
 
-from datetime import datetime, timedelta
-from PIL import Image, ImageDraw, ImageFont
+try:
+    import readline  # line editing and Tab completion of the job info, not available on Windows
+except ImportError:
+    readline = None
+
+from datetime import datetime
+
+from export import ROWS_PER_PAGE, months_de, weekdays_de, preload
+import profiling
+import render_client
+from store import Store
+from suggest import Suggestions
 
 default_name = ''
 if platform.system() == 'Linux':
@@ -13,70 +23,36 @@ if platform.system() == 'Linux':
 
     default_name = pwd.getpwuid(os.getuid()).pw_gecos.split(',')[0]
 
-# ========== paths ==========
-font_file = 'src/RobotoMono.ttf'
-template_file = 'src/template.png'
-empty_template_file = 'src/template_empty.png'
-quickuse_file = 'quickuse.arr'
-
-# ========== fonts & positions ==========
-# name field
-name_pos = (840, 965)
-name_font = ImageFont.truetype(font_file, 115)
-
-# IBAN field
-iban_pos = (1800, 1280)
-iban_font = name_font
-
-# month field
-month_pos = (500, 1910)
-month_font = name_font
-
-# year field
-year_pos = (1610, 1930)
-year_font = ImageFont.truetype(font_file, 95)
-
-# table
-table_font = ImageFont.truetype(font_file, 118)
-table_x_positions = [230, 945, 1805, 2510]
-y_start = 2650
-y_delta = 185.3
-
-# total hour field
-hours_pos = (1790, 6795)
-hours_font = ImageFont.truetype(font_file, 160)
-
-# ========== german localizations ==========
-months_de = ['Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli', 'August', 'September', 'Oktober', 'November',
-             'Dezember']
-weekdays_de = ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So']
-
 # ========== div. configs ==========
 iban_re = re.compile(r'\b[A-Z]{2}[0-9]{2}(?:[ ]?[0-9]{4}){4}(?!(?:[ ]?[0-9]){3})(?:[ ]?[0-9]{1,2})?\b')
 MAX_INFO = 30
+QUICKUSE_ENTRIES = 9  # job infos offered as numbered shortcuts
 TERMINAL_WIDTH = 60
-MAX_TABLE_ENTRIES = 22
 USE_TEMPLATE = True
+OUTPUT_SCALE = 0.25  # the report is rendered directly at 1218x1848 instead of being scaled down afterwards
+OUTPUT_RESAMPLE = 'box'  # filter scaling the template down: nearest, box, bilinear, hamming, bicubic or lanczos
+OUTPUT_QUALITY = 90  # JPEG quality of the image in the PDF
+OUTPUT_DPI = 288  # pixels per inch of the full-size template, which makes 1218x1848 pt pages at every scale
+OUTPUT_MODE = 'RGB'  # RGB, L (gray) or 1 (black and white, stored as CCITT G4 without a JPEG quality)
 
 # ========== objects ==========
-table = []
-
+entries = []  # the rows as plain data for the report and the store
 
-def time_str(seconds):
-    return f'{int(seconds // 3600):0>2},{int((seconds % 3600) / 36):0<2}'
 
+# profiles, job info counts and past rows (the quickuse.arr of older versions is imported on first run)
+store = Store()
+profile = store.profile()
+default_iban = profile['iban'] if profile else ''
+# job infos ranked by their (decaying) number of uses
+suggestions = Suggestions()
+for stored_info, count, last_used in store.job_infos():
+    suggestions.add(stored_info, max(count, 1), last_used)
 
-if os.path.isfile(quickuse_file):
-    with open(quickuse_file, 'rb') as qfile:
-        default_iban, quickuse = pickle.load(qfile)
-else:
-    default_iban, quickuse = '', {}
-
-if USE_TEMPLATE:
-    img = Image.open(template_file)
-else:
-    img = Image.open(empty_template_file)
-template = ImageDraw.Draw(img)
+# a running render service (render_service.py) renders the report with its fonts and templates already loaded,
+# otherwise they are loaded in the background while the prompts are answered
+if not render_client.available():
+    threading.Thread(target=preload, args=(USE_TEMPLATE, OUTPUT_SCALE, OUTPUT_RESAMPLE, OUTPUT_MODE),
+                     daemon=True).start()
 
 
 def terminal_print(print_str, start_line=False, end_line=False):
@@ -95,6 +71,18 @@ def terminal_input(input_str):
     return input(f'|| {input_str}')
 
 
+def complete_info(text, state):
+    """readline completer offering the best job infos starting with the typed text."""
+    matches = suggestions.top(text)
+    return matches[state] if state < len(matches) else None
+
+
+if readline:
+    readline.set_completer_delims('')
+    readline.parse_and_bind('tab: complete')
+    readline.set_completer(lambda text, state: None)  # only the job info prompt completes
+
+
 terminal_print('GENERAL INFO', start_line=True)
 
 while True:
@@ -104,6 +92,9 @@ while True:
         name = terminal_input('Enter your name : ')
     if name:
         terminal_print(f'Name set to: {name}\n')
+        profile = store.profile(name)
+        if profile:
+            default_iban = profile['iban']
         break
     else:
         terminal_print('Name must not be empty.')
@@ -149,12 +140,14 @@ while True:
 
 terminal_print('', end_line=True)
 
-total_seconds = 0.0
-work_time = 0
+# imported only now, so that NumPy does not delay the first prompt
+from worktime import BREAKS, clock, hours_str, work_break
+
 start_date = datetime(year, month, 1)
 
-while len(table) <= MAX_TABLE_ENTRIES:
-    terminal_print(f'ENTRY {len(table) + 1}/22', start_line=True)
+while True:
+    page, row = divmod(len(entries), ROWS_PER_PAGE)
+    terminal_print(f'ENTRY {row + 1}/{ROWS_PER_PAGE} OF PAGE {page + 1}', start_line=True)
     # Day Input
     while True:
         try:
@@ -186,16 +179,15 @@ while len(table) <= MAX_TABLE_ENTRIES:
             if delta.days != 0 or delta.seconds == 0:
                 terminal_print('End time has to be AFTER the start time at the same day.')
                 continue
-            terminal_print(f'Time delta: {time_str(delta.seconds)} hrs')
+            terminal_print(f'Time delta: {hours_str(delta.seconds // 60)} hrs')
 
             # deducting legal break time
-            work_time = delta
-            if delta.seconds/3600 > 9:
-                work_time -= timedelta(minutes=45)
-                terminal_print('Deducting 45 min legal break time, for work time is above 9 hrs.\n')
-            elif delta.seconds/3600 > 6:
-                work_time -= timedelta(minutes=30)
-                terminal_print('Deducting 30 min legal break time, for work time is above 6 hrs.\n')
+            start = start_date.hour * 60 + start_date.minute
+            end = end_date.hour * 60 + end_date.minute
+            work_time, break_time = work_break(start, end)
+            if break_time:
+                limit = next(limit for limit, pause in BREAKS if pause == break_time)
+                terminal_print(f'Deducting {break_time} min legal break time, for work time is above {limit // 60} hrs.\n')
             else:
                 terminal_print('Not deducting break time, for work time is below 6 hrs.\n')
             break
@@ -204,14 +196,18 @@ while len(table) <= MAX_TABLE_ENTRIES:
 
     # Job Info Input
     while True:
-        quick_list = sorted(quickuse, key=lambda x: quickuse[x], reverse=True)
+        quick_list = suggestions.top(k=QUICKUSE_ENTRIES)
         for i, entry in enumerate(quick_list):
             terminal_print(f'{i + 1} "{entry}"')
 
+        if readline:
+            readline.set_completer(complete_info)
         if quick_list:
-            info = terminal_input('Enter the job info or use a number for a shortcut: ').strip()
+            info = terminal_input('Enter the job info or use a number for a shortcut (Tab completes): ').strip()
         else:
             info = terminal_input('Enter the job info: ').strip()
+        if readline:
+            readline.set_completer(lambda text, state: None)
 
         if not info:
             terminal_print('Job Info can not be empty.')
@@ -226,21 +222,15 @@ while len(table) <= MAX_TABLE_ENTRIES:
             else:
                 terminal_print('Index not in quicklist!')
                 continue
-        else:
-            if info in quickuse.keys():
-                quickuse[info] += 1
-            else:
-                quickuse[info] = 1
+        suggestions.add(info)
+        store.use_job_info(info)
         break
 
     # Saving the data for this entry
-    table.append((start_date.strftime('%d.%m. ') + weekdays_de[start_date.weekday()],
-                  start_date.strftime('%H:%M-') + end_date.strftime('%H:%M'),
-                  f'{time_str(work_time.seconds)} hrs',
-                  info))
+    entries.append([start_date.date().isoformat(), start_date.strftime('%H:%M'), end_date.strftime('%H:%M'),
+                    clock(work_time), info])
 
     # Inquiry for new line
-    total_seconds += work_time.seconds
     terminal_print("", end_line=True)
     cancel = False
     while True:
@@ -256,20 +246,16 @@ while len(table) <= MAX_TABLE_ENTRIES:
     if cancel:
         break
 
-# writing the collected data to the image
-template.text(name_pos, name, font=name_font, fill=(0, 0, 0))
-template.text(iban_pos, iban, font=iban_font, fill=(0, 0, 0))
-template.text(month_pos, months_de[month - 1], font=month_font, fill=(0, 0, 0))
-template.text(year_pos, str(year)[2:], font=year_font, fill=(0, 0, 0))
-
-for i, row in enumerate(table):
-    for column in range(4):
-        template.text((table_x_positions[column], y_start + y_delta * i), row[column], font=table_font, fill=(0, 0, 0))
+# with EXPLORHINO_PROFILE set, the time spent in every render stage is printed at the end
+stage_times = profiling.start() if os.environ.get('EXPLORHINO_PROFILE') else None
 
-template.text(hours_pos, f'{time_str(total_seconds)} h', font=hours_font, fill=(0, 0, 0))
-output_fname = f'job_log_{start_date.month:0>2}_{str(start_date.year)[2:]}'
-img.save(f'{output_fname}.png')
-os.system(f'convert -scale 1218x1848 -compress JPEG -quality 90 {output_fname}.png {output_fname}.pdf')
+# rendered by export.py, on the render service (render_service.py) if one runs, otherwise here
+payload = {"name": name, "iban": iban, "month": month - 1, "year": year, "use_pdf_template": USE_TEMPLATE,
+           "entries": entries}
+render_client.export_to_pdf(payload, f'job_log_{start_date.month:0>2}_{str(start_date.year)[2:]}', scale=OUTPUT_SCALE,
+                            mode=OUTPUT_MODE, quality=OUTPUT_QUALITY, dpi=OUTPUT_DPI, resample=OUTPUT_RESAMPLE)
+if stage_times:
+    stage_times.report()
 
-with open(quickuse_file, 'wb') as qfile:
-    pickle.dump((iban, quickuse), qfile)
+store.save_profile(name, iban, USE_TEMPLATE)
+store.save_rows(name, year, month, entries)
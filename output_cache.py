@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Cache of rendered reports, so that exporting unchanged data again copies the stored file instead of rendering it.
+Reports are stored under the hash of everything they are rendered from (see export.report_key) and evicted by age
+and by the total size of the cache, least recently used first. Run as script for its statistics or to prune it.
+"""
+import contextlib
+import os
+import shutil
+import sys
+import threading
+import time
+
+# ========== paths & limits ==========
+cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'explorhino-logger',
+                         'reports')
+MAX_BYTES = 256 * 2 ** 20  # total size of the stored reports
+MAX_AGE = 30 * 24 * 3600  # seconds since a report was last used
+
+
+class OutputCache:
+    """
+    Rendered reports as files named by their key. A stored report is copied to a file object by copy, a new one is
+    stored while it is written by storing. Several processes can share a cache directory: reports are written
+    to temporary files and renamed, a report removed by another process is a miss.
+    """
+
+    def __init__(self, directory=None, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        # the module-level cache_dir is looked up on use, so that it can be changed (e.g. by the benchmarks)
+        return os.path.join(self.directory or cache_dir, key)
+
+    def __contains__(self, key):
+        return os.path.isfile(self.path(key))
+
+    def copy(self, key, fp):
+        """Write the report stored under key to a binary file object, returns its size or None if there is none."""
+        path = self.path(key)
+        try:
+            file = open(path, 'rb')
+        except OSError:  # not stored, removed by another process or an unreadable cache directory
+            with self.lock:
+                self.misses += 1
+            return None
+        with file:
+            shutil.copyfileobj(file, fp)
+            size = file.tell()
+        fp.flush()
+        with contextlib.suppress(OSError):
+            os.utime(path)  # marks the report as recently used
+        with self.lock:
+            self.hits += 1
+        return size
+
+    @contextlib.contextmanager
+    def storing(self, key, fp):
+        """
+        Yield a file object that writes to fp and into the cache at the same time; the report is stored under key
+        when the with block ends without an exception. The report is written to fp even if the cache is not writable.
+        """
+        path = self.path(key)
+        tmp_file = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file = open(tmp_file, 'wb')
+        except OSError as e:
+            print(f'Could not write output cache {path}: {e}', file=sys.stderr)
+            file = None
+        if file is None:
+            yield fp
+            return
+        tee = _Tee(fp, file)
+        try:
+            with file:
+                yield tee
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_file)
+            raise
+        if tee.error:
+            print(f'Could not write output cache {path}: {tee.error}', file=sys.stderr)
+            with contextlib.suppress(OSError):
+                os.remove(tmp_file)
+            return
+        os.replace(tmp_file, path)
+        self.prune()
+
+    def entries(self):
+        """(key, size, last used) of every stored report, least recently used first."""
+        try:
+            with os.scandir(self.directory or cache_dir) as scan:
+                entries = [(entry.name, entry.stat().st_size, entry.stat().st_mtime) for entry in scan
+                           if entry.is_file() and not entry.name.endswith('.tmp')]
+        except FileNotFoundError:
+            return []
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def prune(self, now=None):
+        """Remove reports unused for longer than max_age, then the least recently used ones beyond max_bytes."""
+        now = time.time() if now is None else now
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for key, size, last_used in entries:
+            if now - last_used <= self.max_age and total <= self.max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path(key))
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path(key))
+        with self.lock:
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Statistics of the stored reports and of the lookups of this process."""
+        entries = self.entries()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'oldest': entries[0][2] if entries else None, 'newest': entries[-1][2] if entries else None,
+                'max_bytes': self.max_bytes, 'max_age': self.max_age, 'hits': self.hits, 'misses': self.misses}
+
+
+class _Tee:
+    """Binary file object writing to a stream and to a cache file, errors of the cache file only stop the caching."""
+
+    def __init__(self, fp, file):
+        self.fp = fp
+        self.file = file
+        self.error = None
+
+    def write(self, data):
+        if self.error is None:
+            try:
+                self.file.write(data)
+            except OSError as e:
+                self.error = e
+        return self.fp.write(data)
+
+    def flush(self):
+        self.fp.flush()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Statistics and maintenance of the cache of rendered reports.')
+    parser.add_argument('command', choices=['stats', 'prune', 'clear'], nargs='?', default='stats',
+                        help='stats: size and age of the stored reports (default), prune: evict by age and size now, '
+                             'clear: remove all reports')
+    parser.add_argument('--max-mb', type=float, default=MAX_BYTES / 2 ** 20,
+                        help=f'size limit of prune (default: {MAX_BYTES / 2 ** 20:.0f})')
+    parser.add_argument('--max-days', type=float, default=MAX_AGE / 86400,
+                        help=f'age limit of prune (default: {MAX_AGE / 86400:.0f})')
+    args = parser.parse_args(argv)
+    cache = OutputCache(max_bytes=args.max_mb * 2 ** 20, max_age=args.max_days * 86400)
+    if args.command == 'prune':
+        print(f'{cache.prune()} report(s) removed')
+    elif args.command == 'clear':
+        cache.clear()
+    info = cache.info()
+    print(f'{cache_dir}: {info["entries"]} report(s), '
+          f'{info["bytes"] / 2 ** 20:.1f} of {info["max_bytes"] / 2 ** 20:g} MB')
+    if info['entries']:
+        now = time.time()
+        print(f'last used {(now - info["newest"]) / 86400:.1f} to {(now - info["oldest"]) / 86400:.1f} days ago, '
+              f'evicted after {info["max_age"] / 86400:.0f} days')
+
+
+if __name__ == '__main__':
+    main()
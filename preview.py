@@ -0,0 +1,80 @@
+import math
+
+from PIL import Image
+
+from export import text_cache, text_fields
+
+
+def items_bbox(items, page_size):
+    """Bounding box (in whole pixels, clipped to the page) of all (position, text, font) items, None if empty."""
+    boxes = []
+    for (x, y), text, font in items:
+        left, top, right, bottom = font.getbbox(text)
+        if right > left and bottom > top:
+            boxes.append((x + left, y + top, x + right, y + bottom))
+    if not boxes:
+        return None
+    left = max(0, math.floor(min(box[0] for box in boxes)))
+    top = max(0, math.floor(min(box[1] for box in boxes)))
+    right = min(page_size[0], math.ceil(max(box[2] for box in boxes)))
+    bottom = min(page_size[1], math.ceil(max(box[3] for box in boxes)))
+    return (left, top, right, bottom) if right > left and bottom > top else None
+
+
+def overlaps(box, other):
+    return box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]
+
+
+class PagePreview:
+    """
+    A rendered page kept in memory. On every update only the fields whose text changed are redrawn:
+    their old and new bounding boxes are restored from the pristine template and the new text is drawn on top.
+    A downscaled copy of the page (display) is kept up to date the same way.
+    """
+
+    def __init__(self, template, display_width=400):
+        self.template = template
+        self.page = template.copy()
+        self.fields = {}
+        self.display = self.page.resize((display_width, round(template.height * display_width / template.width)),
+                                        Image.Resampling.BOX)
+
+    def update(self, payload):
+        """Bring the page up to date with the payload, returns the redrawn boxes in page coordinates."""
+        fields = text_fields(payload)
+        boxes = {key: items_bbox(items, self.page.size) for key, items in fields.items()}
+        redraw = {key for key in fields.keys() | self.fields.keys() if fields.get(key) != self.fields.get(key)}
+        dirty = [box for key in redraw for box in (items_bbox(self.fields.get(key, []), self.page.size), boxes.get(key))
+                 if box]
+
+        # a field (partly) covered by a restored box has to be restored and redrawn as well
+        grown = True
+        while grown:
+            grown = False
+            for key, box in boxes.items():
+                if key not in redraw and box and any(overlaps(box, other) for other in dirty):
+                    redraw.add(key)
+                    dirty.append(box)
+                    grown = True
+
+        for box in dirty:
+            self.page.paste(self.template.crop(box), box[:2])
+        for key, items in fields.items():
+            if key in redraw:
+                for position, text, font in items:
+                    text_cache.draw(self.page, position, text, font)
+        self.fields = fields
+
+        for box in dirty:
+            self.update_display(box)
+        return dirty
+
+    def update_display(self, box):
+        """Downscale a region of the page into the display image."""
+        scale_x, scale_y = self.display.width / self.page.width, self.display.height / self.page.height
+        display_box = (math.floor(box[0] * scale_x), math.floor(box[1] * scale_y),
+                       math.ceil(box[2] * scale_x), math.ceil(box[3] * scale_y))
+        source_box = (display_box[0] / scale_x, display_box[1] / scale_y,
+                      display_box[2] / scale_x, display_box[3] / scale_y)
+        size = (display_box[2] - display_box[0], display_box[3] - display_box[1])
+        self.display.paste(self.page.resize(size, Image.Resampling.BOX, box=source_box), display_box[:2])
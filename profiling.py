@@ -0,0 +1,90 @@
+"""
+Optional timing of the render stages. The stages are marked with stage(name) in the render code; they are only timed
+on a thread that runs profile() (or start()), anywhere else marking a stage costs next to nothing.
+"""
+import contextlib
+import json
+import sys
+import threading
+import time
+
+# stages in pipeline order, as reported
+STAGES = ['template decode', 'mode conversion', 'template scale', 'template cache write', 'template copy', 'font load',
+          'text draw', 'background encode', 'encode', 'write']
+
+_local = threading.local()
+
+
+class StageTimes:
+    """Seconds and calls per stage, the time of a stage running inside another one only counts for the inner one."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.running = []  # [stage, start of its current segment], innermost last
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self.running:
+            self.pause(now)
+        self.running.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.pause(now)
+            self.running.pop()
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.running:
+                self.running[-1][1] = now
+
+    def pause(self, now):
+        name, start = self.running[-1]
+        self.seconds[name] = self.seconds.get(name, 0.0) + now - start
+
+    def as_dict(self):
+        """The stages in pipeline order (unknown stages last) as {stage: {'seconds': ..., 'calls': ...}}."""
+        order = STAGES + sorted(self.seconds.keys() - set(STAGES))
+        return {name: {'seconds': self.seconds[name], 'calls': self.calls[name]} for name in order
+                if name in self.seconds}
+
+    def report(self, file=sys.stderr):
+        print(', '.join(f'{name} {times["seconds"]:.3f} s' for name, times in self.as_dict().items()), file=file)
+
+
+def stage(name):
+    """Context manager timing a stage if the current thread is profiled, a no-op otherwise."""
+    times = getattr(_local, 'times', None)
+    return contextlib.nullcontext() if times is None else times.stage(name)
+
+
+def start():
+    """Profile the current thread from now on, returns the StageTimes that collect the stages."""
+    _local.times = StageTimes()
+    return _local.times
+
+
+def stop():
+    _local.times = None
+
+
+@contextlib.contextmanager
+def profile():
+    """Time the stages run on the current thread inside the with block."""
+    previous = getattr(_local, 'times', None)
+    times = start()
+    try:
+        yield times
+    finally:
+        _local.times = previous
+
+
+def dump(results, fname):
+    """Write results (plain data) as JSON, "-" for stdout."""
+    if fname == '-':
+        json.dump(results, sys.stdout, indent=1)
+        print()
+        return
+    with open(fname, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=1)
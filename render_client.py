@@ -0,0 +1,118 @@
+"""
+Thin client of the render service (render_service.py), which renders reports with fonts and templates that are
+already loaded. Without a running service the report is rendered in this process instead.
+Only the standard library is imported, so that asking the service costs a frontend next to nothing.
+"""
+import http.client
+import json
+import os
+import urllib.parse
+
+# ========== service address ==========
+# host:port of the service, EXPLORHINO_SERVICE=off never asks it
+DEFAULT_ADDRESS = '127.0.0.1:8750'
+CONNECT_TIMEOUT = 0.2  # seconds, a local service accepts at once or not at all
+TIMEOUT = 120  # seconds for a render, including the time spent in the service's queue
+
+
+def address():
+    """(host, port) of the service, None if it is switched off."""
+    value = os.environ.get('EXPLORHINO_SERVICE', DEFAULT_ADDRESS)
+    if value.lower() in ('', 'off', '0', 'no'):
+        return None
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class ServiceError(Exception):
+    """The service rejected a request (HTTP status and message)."""
+
+    def __init__(self, status, message):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+
+
+def request(method, path, body=None, timeout=TIMEOUT):
+    """
+    Send a request to the service and return (status, headers, body).
+    Raises OSError if the service does not run (or is switched off).
+    """
+    host_port = address()
+    if host_port is None:
+        raise ConnectionRefusedError('the render service is switched off')
+    connection = http.client.HTTPConnection(*host_port, timeout=CONNECT_TIMEOUT)
+    try:
+        connection.connect()
+        connection.sock.settimeout(timeout)
+        connection.request(method, path, body, {'Content-Type': 'application/json'} if body is not None else {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    except http.client.HTTPException as e:
+        raise ConnectionError(f'invalid response of the render service: {e}') from e
+    finally:
+        connection.close()
+
+
+def available():
+    """Whether a service is running."""
+    try:
+        return request('GET', '/health', timeout=CONNECT_TIMEOUT)[0] == 200
+    except OSError:
+        return False
+
+
+def metrics():
+    """Queue depth, latencies and counters of the service (see render_service.Metrics)."""
+    status, _, body = request('GET', '/metrics')
+    if status != 200:
+        raise ServiceError(status, body.decode(errors='replace'))
+    return json.loads(body)
+
+
+def render(payload, fmt='pdf', scale=1.0, vector=False, mode='RGB', budget=None, title=None, quality=None, dpi=None,
+           resample=None):
+    """
+    Render a plain payload (see export.plain_payload) on the service with the options of export.write_report
+    (those left at None take its defaults) and return the report as bytes, None if no service runs or its queue
+    is full. Raises ServiceError if the service rejected the payload.
+    """
+    options = {'fmt': fmt, 'scale': scale, 'vector': int(vector), 'mode': mode}
+    optional = {'budget': budget, 'title': title, 'quality': quality, 'dpi': dpi, 'resample': resample}
+    options.update((name, value) for name, value in optional.items() if value is not None)
+    try:
+        status, _, body = request('POST', f'/render?{urllib.parse.urlencode(options)}', json.dumps(payload).encode())
+    except OSError:
+        return None
+    if status == 503:  # busy, rendering here is faster than waiting
+        return None
+    if status != 200:
+        raise ServiceError(status, body.decode(errors='replace'))
+    return body
+
+
+def export_to_pdf(payload, output_fname=None, fmt='pdf', scale=1.0, vector=False, mode='RGB', budget=None,
+                  progress=None, quality=None, dpi=None, resample=None):
+    """
+    Like export.export_to_pdf with the output cache: render the payload on the service if one runs,
+    in this process otherwise (with the same options, so the report is the same), and save it to output_fname
+    plus extension. Returns the name of the written file.
+    """
+    import export
+    progress = progress or (lambda percent, stage: None)
+    payload = export.plain_payload(payload)
+    output_fname = output_fname or export.output_name(payload)
+    progress(0, 'Rendering on the render service')
+    report = render(payload, fmt, scale, vector, mode, budget, os.path.basename(output_fname), quality, dpi, resample)
+    if report is not None:
+        with export.replacing(f'{output_fname}.{fmt}') as file:
+            file.write(report)
+        progress(100, 'Saved')
+        return f'{output_fname}.{fmt}'
+    progress(0, 'Loading template')
+    options = {'scale': scale, 'vector': vector, 'mode': mode, 'budget': budget}
+    optional = {'quality': quality, 'dpi': dpi, 'resample': resample}
+    options.update((name, value) for name, value in optional.items() if value is not None)
+    template = export.template_for(payload, fmt, title=os.path.basename(output_fname), cache=export.output_cache,
+                                   **options)
+    return export.export_to_pdf(payload, template, output_fname, progress=progress, fmt=fmt,
+                                cache=export.output_cache, **options)
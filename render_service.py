@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""
+Local render service: keeps the fonts and templates of export.py loaded and renders the JSON payloads posted to it,
+so that a frontend does not have to import Pillow and decode a template for every report (see render_client.py).
+
+    POST /render?fmt=pdf&scale=1&mode=RGB&vector=0[&quality=50][&dpi=72][&resample=box][&budget=BYTES][&title=NAME]
+        payload as JSON body -> the report, rendered by export.write_report with these options
+    GET /metrics   queue depth, counters and latencies as JSON
+    GET /health    200 as soon as the service accepts renders
+
+At most --workers reports are rendered at once (on a thread pool, the loaded resources are shared), up to --queue
+more wait for a free worker; further requests are answered with 503 and Retry-After at once (backpressure).
+"""
+import argparse
+import asyncio
+import collections
+import io
+import json
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import export
+from render_client import DEFAULT_ADDRESS
+
+MAX_BODY = 16 * 2 ** 20  # bytes of a payload
+LATENCY_SAMPLES = 1000  # latest requests the latency percentiles are taken from
+
+reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+content_types = {'pdf': 'application/pdf', 'png': 'image/png', 'jpeg': 'image/jpeg'}
+
+
+class Metrics:
+    """Counters of the requests and the seconds the latest renders waited in the queue, rendered and took in total."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.counts = collections.Counter()  # requests, rendered, cached, rejected, invalid, failed
+        self.latencies = {name: collections.deque(maxlen=LATENCY_SAMPLES) for name in ('queue', 'render', 'total')}
+
+    def add(self, queue, render, total):
+        for name, seconds in (('queue', queue), ('render', render), ('total', total)):
+            self.latencies[name].append(seconds)
+
+    def snapshot(self):
+        latencies = {}
+        for name, samples in self.latencies.items():
+            ordered = sorted(samples)
+            latencies[name] = {'mean': sum(ordered) / len(ordered), 'p50': ordered[len(ordered) // 2],
+                               'p95': ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)],
+                               'max': ordered[-1]} if ordered else None
+        return {'uptime': time.time() - self.started, 'counts': dict(self.counts), 'latency': latencies}
+
+
+class RenderService:
+    def __init__(self, workers=2, queue=16, cache=export.output_cache):
+        self.workers = workers
+        self.queue = queue
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render')
+        self.slots = None  # asyncio.Semaphore of the free workers, created on the event loop
+        self.waiting = 0
+        self.running = 0
+        self.ready = False
+        self.metrics = Metrics()
+
+    async def warm_up(self, scales, mode, resample='box'):
+        """Load fonts and both templates at every scale on the workers, renders are accepted afterwards."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, export.preload, use_template, scale, resample, mode)
+                               for use_template in (True, False) for scale in scales))
+        self.ready = True
+
+    def render_report(self, payload, options):
+        """Render a report on a worker thread, returns its bytes and the seconds per stage of write_report."""
+        template = export.template_for(payload, cache=self.cache, **options)
+        buffer = io.BytesIO()
+        _, seconds = export.write_report(payload, buffer, template=template, cache=self.cache, **options)
+        return buffer.getvalue(), seconds
+
+    async def render(self, payload, options):
+        """Queue a render, returns (status, headers, body)."""
+        if self.waiting >= self.queue:
+            self.metrics.counts['rejected'] += 1
+            return 503, {'Retry-After': '1'}, b'render queue full'
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        queued = time.perf_counter() - start
+        self.running += 1
+        try:
+            report, seconds = await asyncio.get_running_loop().run_in_executor(self.executor, self.render_report,
+                                                                               payload, options)
+        except (ValueError, KeyError, TypeError) as e:
+            self.metrics.counts['invalid'] += 1
+            return 400, {}, f'invalid payload: {e}'.encode()
+        except Exception as e:
+            self.metrics.counts['failed'] += 1
+            return 500, {}, f'{type(e).__name__}: {e}'.encode()
+        finally:
+            self.running -= 1
+            self.slots.release()
+        total = time.perf_counter() - start
+        self.metrics.counts['cached' if 'cache' in seconds else 'rendered'] += 1
+        self.metrics.add(queued, total - queued, total)
+        return 200, {'Content-Type': content_types[options['fmt']], 'X-Queue-Seconds': f'{queued:.4f}',
+                     'X-Render-Seconds': f'{total - queued:.4f}'}, report
+
+    def metrics_snapshot(self):
+        return {'ready': self.ready, 'queue_depth': self.waiting, 'running': self.running, 'workers': self.workers,
+                'queue_size': self.queue, **self.metrics.snapshot(), 'text_cache': export.text_cache.info(),
+                'output_cache': None if self.cache is None else {'hits': self.cache.hits, 'misses': self.cache.misses}}
+
+    async def route(self, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        if url.path == '/health':
+            return (200, {}, b'ok') if self.ready else (503, {'Retry-After': '1'}, b'warming up')
+        if url.path == '/metrics':
+            return 200, {'Content-Type': 'application/json'}, json.dumps(self.metrics_snapshot()).encode()
+        if url.path != '/render':
+            return 404, {}, b'unknown path'
+        if method != 'POST':
+            return 405, {'Allow': 'POST'}, b'POST a payload'
+        self.metrics.counts['requests'] += 1
+        try:
+            payload = json.loads(body)
+            options = parse_options(urllib.parse.parse_qs(url.query))
+        except ValueError as e:
+            self.metrics.counts['invalid'] += 1
+            return 400, {}, f'invalid request: {e}'.encode()
+        return await self.render(payload, options)
+
+    async def handle(self, reader, writer):
+        """Answer a single HTTP/1.1 request per connection."""
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY:
+                status, extra, body = 413, {}, b'payload too large'
+            else:
+                status, extra, body = await self.route(method, target, await reader.readexactly(length))
+        except (ValueError, asyncio.IncompleteReadError):
+            status, extra, body = 400, {}, b'malformed request'
+        head = [f'HTTP/1.1 {status} {reasons[status]}', f'Content-Length: {len(body)}', 'Connection: close']
+        head += [f'{name}: {value}' for name, value in {'Content-Type': 'text/plain', **extra}.items()]
+        try:
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass  # the client gave up, e.g. after its timeout
+
+    async def serve(self, host, port, scales=(1.0,), mode='RGB', resample='box'):
+        self.slots = asyncio.Semaphore(self.workers)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f'render service on http://{host}:{port}, warming up ...', file=sys.stderr)
+        start = time.perf_counter()
+        await self.warm_up(scales, mode, resample)
+        print(f'ready after {time.perf_counter() - start:.2f} s', file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def parse_options(query):
+    """The write_report options of the query string of a render request, raises ValueError for invalid ones."""
+    value = {name: values[-1] for name, values in query.items()}
+    options = {'fmt': value.get('fmt', 'pdf'), 'scale': float(value.get('scale', 1.0)),
+               'vector': value.get('vector', '0').lower() in ('1', 'true', 'yes'), 'mode': value.get('mode', 'RGB'),
+               'budget': int(value['budget']) if 'budget' in value else None, 'title': value.get('title'),
+               'quality': int(value.get('quality', export.QUALITY)), 'dpi': float(value.get('dpi', export.DPI)),
+               'resample': value.get('resample', 'box')}
+    if options['fmt'] not in export.formats:
+        raise ValueError(f'unknown format {options["fmt"]!r}')
+    if options['mode'] not in export.MODES:
+        raise ValueError(f'unknown mode {options["mode"]!r}')
+    if not 0 < options['scale'] <= 1:
+        raise ValueError('the scale must be in (0, 1]')
+    if options['resample'] not in export.RESAMPLE_FILTERS:
+        raise ValueError(f'unknown resample filter {options["resample"]!r}')
+    if not 0 <= options['quality'] <= 100:
+        raise ValueError('the quality must be in [0, 100]')
+    if not options['dpi'] > 0:
+        raise ValueError('the dpi must be positive')
+    return options
+
+
+def main(argv=None):
+    host, _, port = DEFAULT_ADDRESS.rpartition(':')
+    parser = argparse.ArgumentParser(description='Local render service, see render_service.py.')
+    parser.add_argument('--host', default=host, help=f'address to listen on (default: {host}, local only)')
+    parser.add_argument('--port', type=int, default=int(port), help=f'port to listen on (default: {port})')
+    parser.add_argument('-j', '--workers', type=int, default=2, help='reports rendered at once (default: 2)')
+    parser.add_argument('-q', '--queue', type=int, default=16,
+                        help='requests waiting for a worker before further ones are rejected (default: 16)')
+    parser.add_argument('-s', '--scales', type=float, nargs='+', default=[1.0],
+                        help='scales whose templates are loaded at start (default: 1), others are loaded on first use')
+    parser.add_argument('-m', '--mode', choices=export.MODES, default='RGB', help='mode of the loaded templates')
+    parser.add_argument('-r', '--resample', choices=export.RESAMPLE_FILTERS, default='box',
+                        help='filter of the loaded templates (default: box)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', help='do not use the output cache')
+    args = parser.parse_args(argv)
+    service = RenderService(args.workers, args.queue, export.output_cache if args.use_cache else None)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.scales, args.mode, args.resample))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    main()
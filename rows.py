@@ -0,0 +1,91 @@
+import datetime
+from array import array
+
+from worktime import Totals, clock, clocks, to_minutes, work_break, work_breaks
+
+
+class Rows:
+    """
+    The rows of a timesheet stored column by column: dates as proleptic ordinals, start and end as minutes after
+    midnight (in compact arrays) and the locations as list of strings.
+    Iterating yields every row as plain [date, from, to, work time, location] entry (see export.plain_payload),
+    so a Rows object can be used as the entries of a payload without any conversion.
+    The totals of all rows are kept up to date by every change (see worktime.Totals).
+    """
+
+    def __init__(self, entries=()):
+        self.dates = array('l')
+        self.starts = array('H')
+        self.ends = array('H')
+        self.locations = []
+        self.totals = Totals()
+        self.extend(entries)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, row):
+        work, _ = work_break(self.starts[row], self.ends[row])
+        return [self.date(row).isoformat(), clock(self.starts[row]), clock(self.ends[row]), clock(work),
+                self.locations[row]]
+
+    def __iter__(self):
+        starts, ends = self.times()
+        work, _ = work_breaks(starts, ends)
+        columns = (map(datetime.date.isoformat, map(datetime.date.fromordinal, self.dates)), clocks(starts),
+                   clocks(ends), clocks(work), self.locations)
+        return (list(entry) for entry in zip(*columns))
+
+    def times(self, first=0, stop=None):
+        """
+        Start and end minutes of the rows from first to stop (all by default) as NumPy arrays
+        (copies, a view would keep the columns from growing).
+        """
+        import numpy as np
+        return np.array(self.starts[first:stop], dtype=np.int64), np.array(self.ends[first:stop], dtype=np.int64)
+
+    def date(self, row):
+        return datetime.date.fromordinal(self.dates[row])
+
+    def append(self, date, start, end, location):
+        """Add a row, date as datetime.date, start and end as minutes after midnight."""
+        self.dates.append(date.toordinal())
+        self.starts.append(start)
+        self.ends.append(end)
+        self.locations.append(location)
+        self.totals.add(start, end, location)
+
+    def extend(self, entries):
+        """Add plain [date, from, to, work time, location] entries, the work time is recalculated."""
+        first = len(self)
+        for date, start, end, _, location in entries:
+            self.dates.append(datetime.date.fromisoformat(date).toordinal())
+            self.starts.append(to_minutes(start))
+            self.ends.append(to_minutes(end))
+            self.locations.append(location)
+        if len(self) > first:
+            self.totals.add_all(*self.times(first), self.locations[first:])
+
+    def set_times(self, row, start, end):
+        self.totals.remove(self.starts[row], self.ends[row], self.locations[row])
+        self.starts[row], self.ends[row] = start, end
+        self.totals.add(start, end, self.locations[row])
+
+    def set_location(self, row, location):
+        self.totals.remove(self.starts[row], self.ends[row], self.locations[row])
+        self.locations[row] = location
+        self.totals.add(self.starts[row], self.ends[row], location)
+
+    def remove(self, row):
+        self.totals.remove(self.starts[row], self.ends[row], self.locations[row])
+        for column in (self.dates, self.starts, self.ends, self.locations):
+            del column[row]
+
+    def clear(self):
+        for column in (self.dates, self.starts, self.ends, self.locations):
+            del column[:]
+        self.totals = Totals()
+
+    def set_dates(self, date):
+        """Set the date of all rows at once."""
+        self.dates = array('l', [date.toordinal()]) * len(self)
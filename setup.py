@@ -5,5 +5,5 @@ setup(
     name="explorhino-logger",
     version="1.0",
     packages=find_packages(),
-    scripts=['main.py', 'main-gui.py', 'export.py']
+    scripts=['main.py', 'main-gui.py', 'export.py', 'template_cache.py', 'vector_pdf.py', 'preview.py', 'text_cache.py', 'bench.py', 'importer.py', 'store.py', 'suggest.py', 'rows.py', 'worktime.py', 'profiling.py', 'strip_pdf.py', 'output_cache.py', 'render_service.py', 'render_client.py']
 )
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""Local store of profiles, job info usage and past timesheet rows, shared by both frontends."""
+import os
+import pickle
+import sqlite3
+import sys
+import time
+
+# ========== paths ==========
+store_file = 'explorhino.db'
+# state files of older versions, imported once
+quickuse_file = 'quickuse.arr'
+entries_file = 'entries.tmp'
+
+schema = '''
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY,
+    iban TEXT NOT NULL DEFAULT '',
+    use_template INTEGER NOT NULL DEFAULT 1,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_infos (
+    info TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    name TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,  -- 1-12
+    row INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    work TEXT NOT NULL,
+    info TEXT NOT NULL,
+    PRIMARY KEY (name, year, month, row)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS imports (
+    file TEXT PRIMARY KEY,
+    imported REAL NOT NULL
+);
+'''
+
+
+class Store:
+    """
+    SQLite database in WAL mode: any number of readers (e.g. both frontends at once) can read while one writes,
+    and every change is a small transaction instead of a rewrite of the whole file.
+    A Store has to be used from the thread that opened it.
+    """
+
+    def __init__(self, fname=store_file, import_legacy=True):
+        self.db = sqlite3.connect(fname, timeout=10)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(schema)
+        if import_legacy:
+            self.import_legacy()
+
+    def close(self):
+        self.db.close()
+
+    # ========== profiles ==========
+    def profile(self, name=None):
+        """The profile of a person (the last used one without a name) as dict, None if there is none."""
+        query = 'SELECT name, iban, use_template FROM profiles'
+        row = self.db.execute(f'{query} WHERE name = ?', (name,)).fetchone() if name is not None else \
+            self.db.execute(f'{query} ORDER BY last_used DESC LIMIT 1').fetchone()
+        return {'name': row[0], 'iban': row[1], 'use_template': bool(row[2])} if row else None
+
+    def save_profile(self, name, iban, use_template=True, last_used=None):
+        with self.db:
+            self.db.execute('INSERT INTO profiles VALUES (?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET '
+                            'iban = excluded.iban, use_template = excluded.use_template, last_used = excluded.last_used',
+                            (name, iban, int(use_template), last_used or time.time()))
+
+    # ========== job infos ==========
+    def job_infos(self, order='count', limit=-1):
+        """
+        (info, count, last used) of the job infos, most used first (order='count')
+        or most recently used first (order='recent').
+        """
+        order_by = {'count': 'count DESC, last_used DESC', 'recent': 'last_used DESC'}[order]
+        return self.db.execute(f'SELECT info, count, last_used FROM job_infos ORDER BY {order_by} LIMIT ?',
+                               (limit,)).fetchall()
+
+    def use_job_info(self, info, count=1, last_used=None):
+        """Count a use of a job info (count=0 only marks it as recently used)."""
+        with self.db:
+            self.db.execute('INSERT INTO job_infos VALUES (?, ?, ?) ON CONFLICT (info) DO UPDATE SET '
+                            'count = count + excluded.count, last_used = max(last_used, excluded.last_used)',
+                            (info, count, last_used or time.time()))
+
+    # ========== timesheets ==========
+    def rows(self, name, year, month):
+        """The saved rows of a person's month (1-12) as [date, from, to, work time, location] lists."""
+        return [list(row) for row in self.db.execute(
+            'SELECT date, start, end, work, info FROM entries WHERE name = ? AND year = ? AND month = ? ORDER BY row',
+            (name, int(year), month))]
+
+    def save_rows(self, name, year, month, entries):
+        """Replace the saved rows of a person's month (1-12), entries in the plain format of export.plain_payload."""
+        with self.db:
+            self.db.execute('DELETE FROM entries WHERE name = ? AND year = ? AND month = ?', (name, int(year), month))
+            self.db.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                [(name, int(year), month, row, *entry) for row, entry in enumerate(entries)])
+
+    def months(self, name):
+        """(year, month) of every month with saved rows of a person, latest first."""
+        return self.db.execute('SELECT DISTINCT year, month FROM entries WHERE name = ? ORDER BY year DESC, month DESC',
+                               (name,)).fetchall()
+
+    # ========== state files of older versions ==========
+    def import_legacy(self, quickuse_fname=quickuse_file, entries_fname=entries_file):
+        """
+        Import the pickled state of older versions once: quickuse.arr of main.py (IBAN and job info counts)
+        and entries.tmp of main-gui.py (profile and recently used locations). The files are left in place.
+        """
+        for fname, importer in ((quickuse_fname, self.import_quickuse), (entries_fname, self.import_entries)):
+            if not os.path.isfile(fname) or \
+                    self.db.execute('SELECT 1 FROM imports WHERE file = ?', (os.path.abspath(fname),)).fetchone():
+                continue
+            try:
+                with open(fname, 'rb') as file:
+                    state = pickle.load(file)
+                importer(state, os.path.getmtime(fname))
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError, KeyError, TypeError) as error:
+                print(f'Could not import {fname}: {error}', file=sys.stderr)
+                continue
+            with self.db:
+                self.db.execute('INSERT INTO imports VALUES (?, ?)', (os.path.abspath(fname), time.time()))
+
+    def import_quickuse(self, state, modified):
+        iban, quickuse = state
+        if iban and not self.profile(''):
+            self.save_profile('', iban, last_used=modified)
+        for info, count in quickuse.items():
+            self.use_job_info(info, count, modified)
+
+    def import_entries(self, config, modified):
+        if config['name'] and not self.profile(config['name']):
+            self.save_profile(config['name'], config['iban'], config['use_template'], modified)
+        # most recently used first, keep that order
+        for i, location in enumerate(config['locations']):
+            self.use_job_info(location, 0, modified - i)
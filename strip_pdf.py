@@ -0,0 +1,110 @@
+import io
+import time
+import zlib
+
+from profiling import stage
+from template_cache import row_bytes
+from vector_pdf import BACKGROUND_FORMATS, pdf_date, pdf_string
+
+# band heights are multiples of the JPEG block rows (16 with chroma subsampling), so that the blocks of a band are the
+# blocks of the whole page
+BAND_ALIGN = 16
+
+
+def band_height(width, mode, budget):
+    """
+    Rows per band of a page of the given width and mode whose page buffers should take at most budget bytes:
+    a band is held as raw rows read from the template cache, as image (Pillow keeps RGB at 4 bytes per pixel, L and 1
+    at one) and encoded. At least BAND_ALIGN rows.
+    """
+    row = 2 * row_bytes(width, mode) + width * (4 if mode == 'RGB' else 1)
+    return max(BAND_ALIGN, budget // row // BAND_ALIGN * BAND_ALIGN)
+
+
+def encode(band, quality=50):
+    """The band as stream data of its image object: JPEG in RGB and L mode, Flate compressed packed rows in mode 1."""
+    if band.mode == '1':
+        return zlib.compress(band.tobytes())
+    buffer = io.BytesIO()
+    band.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def write(fp, pages, page_count, page_size, image_size, height, mode='RGB', title='', created=None, quality=50,
+          seconds=None):
+    """
+    Write a PDF to a binary file object page by page and band by band, without holding more than one band:
+    pages yields an iterable of (top row, image) bands per page, every band becomes an image of its own, placed below
+    the previous one. All pages have image_size pixels cut into bands of the given height (the last one may be lower),
+    which are stretched over page_size points (not necessarily whole ones).
+    The file object does not have to be seekable.
+    The seconds spent encoding and writing are added to the 'encode' and 'write' entries of the optional seconds dict.
+    Returns the number of bytes written.
+    """
+    page_width, page_height = page_size
+    _, image_height = image_size
+    band_count = -(-image_height // height)
+    color_space, bits, image_filter = BACKGROUND_FORMATS[mode]
+    seconds = {} if seconds is None else seconds
+    seconds.setdefault('encode', 0.0)
+    seconds.setdefault('write', 0.0)
+    offsets = []
+    written = 0
+
+    def write_object(obj):
+        nonlocal written
+        start = time.perf_counter()
+        with stage('write'):
+            offsets.append(written)
+            chunk = f'{len(offsets)} 0 obj\n'.encode() + obj + b'\nendobj\n'
+            fp.write(chunk)
+            written += len(chunk)
+        seconds['write'] += time.perf_counter() - start
+
+    # catalog, page tree and info first (objects 1-3), then every page, its content stream and its bands
+    first_pages = [4 + page * (2 + band_count) for page in range(page_count)]
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    fp.write(header)
+    written += len(header)
+    write_object(b'<< /Type /Catalog /Pages 2 0 R >>')
+    write_object(f'<< /Type /Pages /Kids [{" ".join(f"{obj} 0 R" for obj in first_pages)}] '
+                 f'/Count {page_count} >>'.encode())
+    write_object(b'<< /Producer (explorhino-logger) /Title ' + pdf_string(title)
+                 + (b' /CreationDate ' + pdf_date(created) + b' /ModDate ' + pdf_date(created) if created else b'')
+                 + b' >>')
+
+    y_scale = page_height / image_height  # points per image row
+    for first, bands in zip(first_pages, pages):
+        content = []
+        for band in range(band_count):
+            top, rows = band * height, min(height, image_height - band * height)
+            bottom = page_height - (top + rows) * y_scale
+            content.append(f'q {page_width:g} 0 0 {rows * y_scale:.4f} 0 {bottom:.4f} cm /B{band} Do Q'.encode())
+        content = zlib.compress(b'\n'.join(content))
+        images = ' '.join(f'/B{band} {first + 2 + band} 0 R' for band in range(band_count))
+        write_object(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:g} {page_height:g}] '
+                     f'/Contents {first + 1} 0 R /Resources << /XObject << {images} >> >> >>'.encode())
+        write_object(f'<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n'.encode() + content
+                     + b'\nendstream')
+        for _, band in bands:
+            start = time.perf_counter()
+            with stage('encode'):
+                data = encode(band, quality)
+            seconds['encode'] += time.perf_counter() - start
+            write_object(f'<< /Type /XObject /Subtype /Image /Width {band.width} /Height {band.height} '
+                         f'/ColorSpace /{color_space} /BitsPerComponent {bits} /Filter /{image_filter} '
+                         f'/Length {len(data)} >>\nstream\n'.encode() + data + b'\nendstream')
+
+    start = time.perf_counter()
+    with stage('write'):
+        xref = written
+        trailer = [f'xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n'.encode()]
+        trailer += [f'{offset:010} 00000 n \n'.encode() for offset in offsets]
+        trailer.append(f'trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R /Info 3 0 R >>\n'
+                       f'startxref\n{xref}\n%%EOF\n'.encode())
+        trailer = b''.join(trailer)
+        fp.write(trailer)
+        fp.flush()
+        written += len(trailer)
+    seconds['write'] += time.perf_counter() - start
+    return written
@@ -0,0 +1,76 @@
+import math
+import time
+
+# ========== ranking ==========
+HALF_LIFE = 60 * 24 * 3600  # a use counts half as much after 60 days
+TOP_K = 10  # matches kept ready per prefix, more are collected from the subtree
+
+
+class Node:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # the best TOP_K infos of this subtree, best first
+
+
+class Suggestions:
+    """
+    Job infos ranked by usage counts that decay exponentially over time, with a case-insensitive prefix index.
+    The index is a trie whose nodes keep their TOP_K best infos, so a query only walks the typed prefix.
+    All counts decay at the same rate, so the ranking never changes by itself: every score is stored as
+    log2 of the count at a fixed reference time and a use only has to update the nodes along its path.
+    """
+
+    def __init__(self, half_life=HALF_LIFE):
+        self.half_life = half_life
+        self.scores = {}
+        self.root = Node()
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, info):
+        return info in self.scores
+
+    def add(self, info, count=1, when=None):
+        """Count uses of an info at the given time (seconds since the epoch, now by default)."""
+        if count <= 0:
+            return
+        score = math.log2(count) + (time.time() if when is None else when) / self.half_life
+        old = self.scores.get(info)
+        if old is not None:  # log2(2^old + 2^score)
+            score = max(old, score) + math.log2(1 + 2 ** -abs(old - score))
+        self.scores[info] = score
+
+        node = self.root
+        self.update_top(node, info)
+        for char in info.casefold():
+            node = node.children.setdefault(char, Node())
+            self.update_top(node, info)
+
+    def update_top(self, node, info):
+        # scores only grow, so an info that is not among the best of a node can only move up into them
+        if info not in node.top:
+            node.top.append(info)
+        node.top.sort(key=self.scores.__getitem__, reverse=True)
+        del node.top[TOP_K:]
+
+    def count(self, info, now=None):
+        """The decayed number of uses of an info."""
+        if info not in self.scores:
+            return 0.0
+        return 2 ** (self.scores[info] - (time.time() if now is None else now) / self.half_life)
+
+    def top(self, prefix='', k=TOP_K):
+        """The k best infos starting with the prefix (ignoring case), best first."""
+        node = self.root
+        for char in prefix.casefold():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        if k <= TOP_K:
+            return node.top[:k]
+        prefix = prefix.casefold()
+        matches = [info for info in self.scores if info.casefold().startswith(prefix)]
+        return sorted(matches, key=self.scores.__getitem__, reverse=True)[:k]
@@ -0,0 +1,135 @@
+import contextlib
+import functools
+import glob
+import hashlib
+import mmap
+import os
+import sys
+import threading
+
+from PIL import Image
+
+from profiling import stage
+
+# ========== paths ==========
+cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'explorhino-logger')
+
+
+def file_hash(fname):
+    """Hash of the content of a file, only read again after the file was changed."""
+    stat = os.stat(fname)
+    return _file_hash(fname, stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=None)
+def _file_hash(fname, mtime, size):
+    with open(fname, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()[:16]
+
+
+def scaled_size(size, scale=1.0):
+    return tuple(max(1, round(length * scale)) for length in size)
+
+
+def row_bytes(width, mode='RGB'):
+    """Bytes per row of a raw buffer of the given mode (bilevel rows are packed to whole bytes)."""
+    return (width * (1 if mode == '1' else 8 * len(mode)) + 7) // 8
+
+
+def cache_file(fname, mode='RGB', scale=1.0, resample='box'):
+    """
+    Path of the raw cache of a (scaled) template, keyed by the hash of the source file, and the cached size.
+    Scaled templates are also keyed by the resampling filter.
+    """
+    stem = os.path.splitext(os.path.basename(fname))[0]
+    with Image.open(fname) as img:  # only reads the header
+        width, height = scaled_size(img.size, scale)
+    suffix = '' if scale == 1 else f'-{resample}'
+    return os.path.join(cache_dir, f'{stem}-{file_hash(fname)}-{mode}-{width}x{height}{suffix}.raw'), (width, height)
+
+
+def build(fname, mode='RGB', scale=1.0, resample='box'):
+    """
+    Decode (and scale) the template, write its raw pixel buffer to the cache
+    and drop outdated buffers of the same template.
+    resample names one of Pillow's filters (nearest, box, bilinear, hamming, bicubic, lanczos);
+    box filtering averages the covered pixels, like ImageMagick's -scale.
+    Bilevel templates (mode '1') are scaled in gray and then thresholded at half intensity, without dithering.
+    """
+    raw_file, size = cache_file(fname, mode, scale, resample)
+    if scale == 1:
+        with stage('template decode'):
+            img = Image.open(fname)
+            img.load()
+        with stage('mode conversion'):
+            img = img.convert('L').convert('1', dither=Image.Dither.NONE) if mode == '1' else img.convert(mode)
+    else:
+        img = load(fname, 'L' if mode == '1' else mode)
+        with stage('template scale'):
+            img = img.resize(size, Image.Resampling[resample.upper()])
+        if mode == '1':
+            with stage('mode conversion'):
+                img = img.convert('1', dither=Image.Dither.NONE)
+    # the metadata of the PNG (color profile, dpi, ...) is not cached, so a built template is the same as a loaded one
+    img.info = {}
+    with stage('template cache write'):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # processes (and threads) building the same cache at once each write their own file, the renaming
+            # replaces the cache in one step, so that a reader never maps a partly written buffer
+            tmp_file = f'{raw_file}.{os.getpid()}-{threading.get_ident()}.tmp'
+            try:
+                with open(tmp_file, 'wb') as file:
+                    file.write(img.tobytes())
+                os.replace(tmp_file, raw_file)
+            except OSError:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_file)
+                raise
+            stem = os.path.splitext(os.path.basename(fname))[0]
+            suffix = '' if scale == 1 else f'-{resample}'
+            for old_file in glob.glob(os.path.join(cache_dir, f'{stem}-*-{mode}-{size[0]}x{size[1]}{suffix}.raw')):
+                if old_file != raw_file:
+                    with contextlib.suppress(FileNotFoundError):  # removed by another process
+                        os.remove(old_file)
+        except OSError as e:
+            print(f'Could not write template cache {raw_file}: {e}', file=sys.stderr)
+    return img
+
+
+def load(fname, mode='RGB', scale=1.0, resample='box'):
+    """
+    Return the template as a writable image of the given mode, scaled by the given factor with the given filter.
+    The pixels are memory-mapped from the raw cache, which is (re)built whenever the template file changes.
+    """
+    with stage('template decode'):
+        raw_file, (width, height) = cache_file(fname, mode, scale, resample)
+        if not os.path.isfile(raw_file) or os.path.getsize(raw_file) != row_bytes(width, mode) * height:
+            return build(fname, mode, scale, resample)
+        with open(raw_file, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            # decoding copies the buffer (frombuffer would share the map for L), so the image stays valid and
+            # writable after the map is closed
+            return Image.frombytes(mode, (width, height), buffer)
+
+
+def bands(fname, mode='RGB', scale=1.0, resample='box', height=256):
+    """
+    Yield the template as (top row, image) bands of at most the given height, from top to bottom, which are read one
+    after the other from the raw cache, so that only a single band is in memory. Building a missing cache still
+    decodes the whole template once.
+    """
+    raw_file, (width, full_height) = cache_file(fname, mode, scale, resample)
+    stride = row_bytes(width, mode)
+    if not os.path.isfile(raw_file) or os.path.getsize(raw_file) != stride * full_height:
+        img = build(fname, mode, scale, resample)
+        if not os.path.isfile(raw_file):  # the cache could not be written, the decoded template is cut instead
+            for top in range(0, full_height, height):
+                yield top, img.crop((0, top, width, min(top + height, full_height)))
+            return
+        del img
+    with open(raw_file, 'rb') as file:
+        for top in range(0, full_height, height):
+            rows = min(height, full_height - top)
+            with stage('template decode'):
+                band = Image.frombytes(mode, (width, rows), file.read(rows * stride))
+            yield top, band
@@ -0,0 +1,56 @@
+"""Tests of the gray and black and white render modes against the RGB render, run with: python3 -m pytest"""
+import io
+
+import pytest
+from PIL import ImageChops
+
+import export
+import template_cache
+
+# fraction of the pixels of a bilevel page that may differ from the RGB page thresholded at half intensity
+# (the antialiased edges of the text are thresholded after scaling in RGB, but scaled in gray in mode 1)
+BILEVEL_TOLERANCE = 0.02
+
+
+@pytest.fixture(scope='module', autouse=True)
+def cache_dir(tmp_path_factory):
+    """Build the template caches in a temporary directory instead of the user's cache."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(template_cache, 'cache_dir', str(tmp_path_factory.mktemp('templates')))
+        yield
+
+
+@pytest.fixture(scope='module')
+def payload():
+    entries = [[f'2025-03-{day:02}', '08:00', f'{12 + day % 8}:00', '', 'Lab'] for day in range(1, 23)]
+    return {"name": "Max Mustermann", "iban": "DE89370400440532013000", "month": 2, "year": 2025,
+            "use_pdf_template": True, "entries": entries}
+
+
+def render(payload, scale, mode):
+    return export.render(payload, export.get_template(True, scale, mode=mode), scale)
+
+
+@pytest.mark.parametrize('scale', [1.0, 0.25])
+def test_gray_matches_rgb(payload, scale):
+    page = render(payload, scale, 'L')
+    assert page.mode == 'L'
+    difference = ImageChops.difference(render(payload, scale, 'RGB').convert('L'), page)
+    assert max(value for value, count in enumerate(difference.histogram()) if count) <= 1
+
+
+@pytest.mark.parametrize('scale', [1.0, 0.25])
+def test_bilevel_matches_thresholded_rgb(payload, scale):
+    page = render(payload, scale, '1')
+    assert page.mode == '1'
+    reference = render(payload, scale, 'RGB').convert('L').point([0] * 128 + [255] * 128)
+    histogram = ImageChops.difference(reference, page.convert('L')).histogram()
+    assert 1 - histogram[0] / (page.width * page.height) < BILEVEL_TOLERANCE
+
+
+@pytest.mark.parametrize('mode', export.MODES)
+@pytest.mark.parametrize('vector', [False, True])
+def test_pdf_in_every_mode(payload, mode, vector):
+    buffer = io.BytesIO()
+    export.write_report(payload, buffer, scale=0.25, vector=vector, mode=mode)
+    assert buffer.getvalue().startswith(b'%PDF')
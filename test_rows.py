@@ -0,0 +1,67 @@
+"""Tests of the totals kept up to date by rows.Rows against summing all rows again, run with: python3 -m pytest"""
+import datetime
+import random
+
+import pytest
+
+import worktime
+from rows import Rows
+
+locations = ['Lab', 'Schule', 'Museum', 'Ferienprogramm', 'Forschertag']
+
+
+def summed(rows):
+    """Work and break minutes and the work minutes and rows per location, summed from all rows."""
+    work, breaks = worktime.work_breaks(*rows.times())
+    per_location = {}
+    for location, minutes in zip(rows.locations, work.tolist()):
+        entry = per_location.setdefault(location, [0, 0])
+        entry[0] += minutes
+        entry[1] += 1
+    return int(work.sum()), int(breaks.sum()), per_location
+
+
+def totals(rows):
+    return rows.totals.work, rows.totals.breaks, rows.totals.locations
+
+
+@pytest.fixture
+def rows():
+    rng = random.Random(0)
+    entries = [[f'2025-03-{i % 28 + 1:02}', worktime.clock(rng.randrange(24 * 60)),
+                worktime.clock(rng.randrange(24 * 60)), '', rng.choice(locations)] for i in range(200)]
+    return Rows(entries)
+
+
+def test_extend(rows):
+    assert totals(rows) == summed(rows)
+
+
+def test_edits(rows):
+    rng = random.Random(1)
+    for _ in range(1000):
+        row = rng.randrange(len(rows))
+        if rng.random() < 0.5:
+            rows.set_times(row, rng.randrange(24 * 60), rng.randrange(24 * 60))
+        else:
+            rows.set_location(row, rng.choice(locations + ['']))
+        assert totals(rows) == summed(rows)
+
+
+def test_append_remove_clear(rows):
+    rng = random.Random(2)
+    for _ in range(300):
+        if rows and rng.random() < 0.5:
+            rows.remove(rng.randrange(len(rows)))
+        else:
+            rows.append(datetime.date(2025, 3, 3), rng.randrange(24 * 60), rng.randrange(24 * 60),
+                        rng.choice(locations))
+        assert totals(rows) == summed(rows)
+    rows.clear()
+    assert totals(rows) == (0, 0, {})
+
+
+def test_emptied_location_is_dropped():
+    rows = Rows([['2025-03-03', '09:00', '17:00', '', 'Lab']])
+    rows.set_location(0, 'Schule')
+    assert rows.totals.locations == {'Schule': [450, 1]}
@@ -0,0 +1,96 @@
+"""Tests of worktime.py against the per-row calculations the frontends used before, run with: python3 -m pytest"""
+import datetime
+
+import numpy as np
+import pytest
+
+import worktime
+
+
+def reference_row(start, end):
+    """
+    Work and break minutes of one row, computed per row as main-gui.py did before worktime.py
+    (in minutes, an end before the start wraps around midnight).
+    """
+    minutes = (end - start) % (24 * 60)
+    break_minutes = 45 if minutes > 9 * 60 else 30 if minutes > 6 * 60 else 0
+    return minutes - break_minutes, break_minutes
+
+
+def timedelta_row(start, end):
+    """Work minutes of one row by main.py's former timedelta arithmetic, which only accepted an end after the start."""
+    work = datetime.timedelta(minutes=end) - datetime.timedelta(minutes=start)
+    if work.seconds / 3600 > 9:
+        work -= datetime.timedelta(minutes=45)
+    elif work.seconds / 3600 > 6:
+        work -= datetime.timedelta(minutes=30)
+    return work.seconds // 60
+
+
+@pytest.fixture(scope='module')
+def rows():
+    """Random rows plus every span around the break limits from every start of an hour, as start and end arrays."""
+    rng = np.random.default_rng(0)
+    boundary = np.array([(start, start + span) for start in range(0, 24 * 60, 60)
+                         for limit, _ in worktime.BREAKS for span in (limit - 1, limit, limit + 1)
+                         if start + span < 24 * 60])
+    return (np.concatenate([rng.integers(0, 24 * 60, 20000), boundary[:, 0]]),
+            np.concatenate([rng.integers(0, 24 * 60, 20000), boundary[:, 1]]))
+
+
+def test_work_breaks_match_per_row(rows):
+    starts, ends = rows
+    work, breaks = worktime.work_breaks(starts, ends)
+    expected = np.array([reference_row(start, end) for start, end in zip(starts.tolist(), ends.tolist())])
+    assert work.tolist() == expected[:, 0].tolist()
+    assert breaks.tolist() == expected[:, 1].tolist()
+
+
+def test_work_break_matches_per_row(rows):
+    starts, ends = rows
+    assert [list(worktime.work_break(start, end)) for start, end in zip(starts.tolist(), ends.tolist())] == \
+        [list(reference_row(start, end)) for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def test_work_breaks_match_timedelta_arithmetic(rows):
+    starts, ends = rows
+    forward = ends > starts
+    work, _ = worktime.work_breaks(starts[forward], ends[forward])
+    assert work.tolist() == [timedelta_row(start, end)
+                             for start, end in zip(starts[forward].tolist(), ends[forward].tolist())]
+
+
+@pytest.mark.parametrize('span, expected', [
+    (6 * 60 - 1, (6 * 60 - 1, 0)), (6 * 60, (6 * 60, 0)), (6 * 60 + 1, (6 * 60 - 29, 30)),
+    (9 * 60 - 1, (9 * 60 - 31, 30)), (9 * 60, (9 * 60 - 30, 30)), (9 * 60 + 1, (9 * 60 - 44, 45)),
+])
+def test_break_limits(span, expected):
+    assert worktime.work_break(8 * 60, 8 * 60 + span) == expected
+    assert [value.item() for value in worktime.work_breaks(8 * 60, 8 * 60 + span)] == list(expected)
+
+
+def test_midnight_wraps():
+    assert worktime.work_break(22 * 60, 2 * 60) == (4 * 60, 0)
+    assert worktime.work_break(8 * 60, 8 * 60) == (0, 0)
+
+
+def test_totals_match_summed_clock_strings(rows):
+    # export.py summed the 'HH:MM' work times of the entries
+    starts, ends = rows
+    months = np.random.default_rng(1).integers(0, 100, len(starts))
+    total_work, total_breaks = worktime.totals(starts, ends, months, 100)
+    work, breaks = worktime.work_breaks(starts, ends)
+    sums = [0] * 100
+    for month, work_time in zip(months.tolist(), worktime.clocks(work)):
+        sums[month] += worktime.to_minutes(work_time)
+    assert total_work.tolist() == sums
+    assert total_breaks.sum() == breaks.sum()
+    assert worktime.totals(starts, ends) == (sum(sums), int(breaks.sum()))
+
+
+@pytest.mark.parametrize('minutes, expected', [
+    (0, ' 0,00'), (3, ' 0,05'), (27, ' 0,45'), (59, ' 0,98'), (450, ' 7,50'), (600, '10,00'), (6001, '100,01'),
+])
+def test_hours_str(minutes, expected):
+    # hundredths of hours are truncated, as on the report
+    assert worktime.hours_str(minutes) == expected
@@ -0,0 +1,58 @@
+import math
+import threading
+from collections import OrderedDict
+
+
+class TextCache:
+    """
+    Bounded LRU cache of rendered text masks, keyed by (font file, font size, text, sub-pixel offset, bilevel).
+    Pasting a cached mask gives exactly the same pixels as ImageDraw.text, without rasterizing the text again;
+    text on bilevel images (mode '1') is drawn without anti-aliasing, as ImageDraw does.
+    The cache can be shared between threads.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.masks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def mask(self, text, font, fraction=(0.0, 0.0), bilevel=False):
+        """The mask of the text drawn at the given sub-pixel offset, and the offset of the mask to the position."""
+        key = (font.path, font.size, text, fraction, bilevel)
+        with self.lock:
+            if key in self.masks:
+                self.hits += 1
+                self.masks.move_to_end(key)
+                return self.masks[key]
+            self.misses += 1
+
+        from PIL import Image, ImageDraw
+        right, bottom = font.getbbox(text)[2:]
+        mask = Image.new('1' if bilevel else 'L', (max(right, 0) + 2, max(bottom, 0) + 2))
+        ImageDraw.Draw(mask).text(fraction, text, font=font, fill=255)
+        bbox = mask.getbbox()
+        entry = (mask.crop(bbox), bbox[:2]) if bbox else (None, (0, 0))
+        with self.lock:
+            self.masks[key] = entry
+            if len(self.masks) > self.maxsize:
+                self.masks.popitem(last=False)
+        return entry
+
+    def draw(self, img, position, text, font, fill=(0, 0, 0)):
+        """Drop-in replacement of ImageDraw.Draw(img).text(position, text, font=font, fill=fill)."""
+        # the fraction is taken from the next lower pixel, also for positions above or left of the image
+        x, y = math.floor(position[0]), math.floor(position[1])
+        mask, (left, top) = self.mask(text, font, (position[0] - x, position[1] - y), img.mode == '1')
+        if mask is not None:
+            x, y = x + left, y + top
+            img.paste(fill, (x, y, x + mask.width, y + mask.height), mask)
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.masks), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self.lock:
+            self.masks.clear()
+            self.hits = self.misses = 0
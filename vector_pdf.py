@@ -0,0 +1,101 @@
+import functools
+import time
+import zlib
+
+from PIL import ImageFont
+
+# PDF font flags: fixed pitch (1) + nonsymbolic (32)
+FONT_FLAGS = 33
+FIRST_CHAR, LAST_CHAR = 32, 255
+
+
+def pdf_string(text):
+    """Encode text as a PDF literal string in WinAnsiEncoding (characters outside of cp1252 become '?')."""
+    raw = text.encode('cp1252', errors='replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def pdf_date(created):
+    return f"(D:{time.strftime('%Y%m%d%H%M%S', created)}Z)".encode()
+
+
+@functools.lru_cache(maxsize=None)
+def font_resources(font_file):
+    """The compressed font program, the glyph widths and metrics (in 1/1000 em) of a TrueType font, built once."""
+    with open(font_file, 'rb') as file:
+        program = file.read()
+    font = ImageFont.truetype(font_file, 1000)
+    widths = []
+    for code in range(FIRST_CHAR, LAST_CHAR + 1):
+        char = bytes([code]).decode('cp1252', errors='replace')
+        widths.append(round(font.getlength(char)))
+    ascent, descent = font.getmetrics()
+    return zlib.compress(program), len(program), widths, ascent, descent
+
+
+# color space, bits per pixel and filter of the background image per image mode
+BACKGROUND_FORMATS = {'RGB': ('DeviceRGB', 8, 'DCTDecode'), 'L': ('DeviceGray', 8, 'DCTDecode'),
+                      '1': ('DeviceGray', 1, 'FlateDecode')}
+
+
+def write(fp, background, background_size, page_size, pages, font_file, title='', created=None, mode='RGB', unit=1):
+    """
+    Write a PDF to a binary file object with one page per list of (position, text, font) items in pages:
+    the background image covers the whole page (JPEG encoded in RGB or L mode, the Flate compressed packed rows
+    of a bilevel image in mode 1) and every item is written as real text in the embedded TrueType font.
+    Background and font are embedded once and shared by all pages.
+    Positions, font sizes and page_size are in template pixels (top-left origin), one pixel is unit points.
+    Returns the number of bytes written.
+    """
+    page_width, page_height = page_size
+    font_program, program_length, widths, ascent, descent = font_resources(font_file)
+    color_space, bits, image_filter = BACKGROUND_FORMATS[mode]
+
+    # shared resources first (objects 3-6), then a page and its content stream per page
+    kids = ' '.join(f'{7 + 2 * page} 0 R' for page in range(len(pages)))
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'.encode(),
+        f'<< /Type /XObject /Subtype /Image /Width {background_size[0]} /Height {background_size[1]} '
+        f'/ColorSpace /{color_space} /BitsPerComponent {bits} /Filter /{image_filter} '
+        f'/Length {len(background)} >>\nstream\n'.encode() + background + b'\nendstream',
+        f'<< /Type /Font /Subtype /TrueType /BaseFont /RobotoMono /FirstChar {FIRST_CHAR} /LastChar {LAST_CHAR} '
+        f'/Widths [{" ".join(map(str, widths))}] /Encoding /WinAnsiEncoding /FontDescriptor 5 0 R >>'.encode(),
+        f'<< /Type /FontDescriptor /FontName /RobotoMono /Flags {FONT_FLAGS} '
+        f'/FontBBox [0 {-descent} {max(widths)} {ascent}] /ItalicAngle 0 /Ascent {ascent} /Descent {-descent} '
+        f'/CapHeight {ascent} /StemV 80 /FontFile2 6 0 R >>'.encode(),
+        f'<< /Length {len(font_program)} /Length1 {program_length} /Filter /FlateDecode >>\nstream\n'.encode()
+        + font_program + b'\nendstream',
+    ]
+    for page, items in enumerate(pages):
+        content = [f'{unit:g} 0 0 {unit:g} 0 0 cm'.encode()] if unit != 1 else []
+        content += [f'q {page_width} 0 0 {page_height} 0 0 cm /Bg Do Q'.encode(), b'BT 0 g']
+        for (x, y), text, font in items:
+            # Pillow positions the top of the ascender, PDF the baseline
+            baseline = page_height - (y + ascent * font.size / 1000)
+            content.append(f'/F1 {font.size} Tf 1 0 0 1 {x:.2f} {baseline:.2f} Tm '.encode() + pdf_string(text)
+                           + b' Tj')
+        content.append(b'ET')
+        content = zlib.compress(b'\n'.join(content))
+        objects += [
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width * unit:g} {page_height * unit:g}] '
+            f'/Contents {8 + 2 * page} 0 R '
+            f'/Resources << /XObject << /Bg 3 0 R >> /Font << /F1 4 0 R >> >> >>'.encode(),
+            f'<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n'.encode() + content + b'\nendstream',
+        ]
+    objects.append(b'<< /Producer (explorhino-logger) /Title ' + pdf_string(title)
+                   + (b' /CreationDate ' + pdf_date(created) + b' /ModDate ' + pdf_date(created) if created else b'')
+                   + b' >>')
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n'.encode() + obj + b'\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += b''.join(f'{offset:010} 00000 n \n'.encode() for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R /Info {len(objects)} 0 R >>\n'.encode()
+    out += f'startxref\n{xref}\n%%EOF\n'.encode()
+    fp.write(out)
+    return len(out)
@@ -0,0 +1,100 @@
+"""Work time, break time and totals of timesheet rows, calculated on whole arrays of start and end times at once."""
+import numpy as np
+
+# ========== break rules ==========
+# (minutes worked in a row, minutes of break deducted above that), longest first
+BREAKS = [(9 * 60, 45), (6 * 60, 30)]
+DAY = 24 * 60
+
+
+def to_minutes(clock):
+    """Minutes after midnight of an 'HH:MM' string."""
+    hours, minutes = clock.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def clock(minutes):
+    """'HH:MM' of a number of minutes."""
+    hours, minutes = divmod(int(minutes), 60)
+    return f'{hours:02}:{minutes:02}'
+
+
+def clocks(minutes):
+    """'HH:MM' of every number of minutes in an array."""
+    return [f'{hours:02}:{rest:02}' for hours, rest in zip(*(array.tolist() for array in np.divmod(minutes, 60)))]
+
+
+def hours_str(minutes):
+    """A number of minutes as decimal hours with a comma and truncated hundredths, as on the report (' 7,50')."""
+    hours, minutes = divmod(int(minutes), 60)
+    return f'{hours:>2},{minutes * 100 // 60:02}'
+
+
+def work_break(start, end):
+    """Work and break minutes of a single row, as work_breaks without the overhead of NumPy for a single value."""
+    span = (int(end) - int(start)) % DAY
+    pause = next((pause for limit, pause in BREAKS if span > limit), 0)
+    return span - pause, pause
+
+
+def work_breaks(starts, ends):
+    """
+    Work and break minutes of rows from starts to ends (minutes after midnight, arrays or single values).
+    An end before its start wraps around midnight, the break is deducted by the BREAKS rules.
+    """
+    span = (np.asarray(ends, dtype=np.int64) - np.asarray(starts, dtype=np.int64)) % DAY
+    breaks = np.select([span > limit for limit, _ in BREAKS], [pause for _, pause in BREAKS], 0)
+    return span - breaks, breaks
+
+
+def totals(starts, ends, months=None, count=None):
+    """
+    Total work and break minutes of the rows of a month, or with months (the index of every row's month in a batch)
+    the totals of every month as two arrays of length count (by default the largest index + 1).
+    """
+    work, breaks = work_breaks(starts, ends)
+    if months is None:
+        return int(work.sum()), int(breaks.sum())
+    months = np.asarray(months, dtype=np.int64)
+    count = count if count is not None else int(months.max(initial=-1)) + 1
+    return (np.bincount(months, work, count).astype(np.int64),
+            np.bincount(months, breaks, count).astype(np.int64))
+
+
+class Totals:
+    """
+    Work and break minutes of a month, and the work minutes and rows per location, kept up to date by adding and
+    removing single rows instead of summing all rows again.
+    """
+
+    def __init__(self):
+        self.work = 0
+        self.breaks = 0
+        self.locations = {}  # location: [work minutes, rows]
+
+    def add(self, start, end, location, rows=1):
+        """Count a row from start to end (minutes after midnight), rows=-1 removes it again."""
+        work, breaks = work_break(start, end)
+        self.work += rows * work
+        self.breaks += rows * breaks
+        self.count(location, rows * work, rows)
+
+    def remove(self, start, end, location):
+        self.add(start, end, location, -1)
+
+    def add_all(self, starts, ends, locations):
+        """Count many rows at once (arrays of start and end minutes and a list of locations)."""
+        work, breaks = work_breaks(starts, ends)
+        self.work += int(work.sum())
+        self.breaks += int(breaks.sum())
+        names, index = np.unique(np.asarray(locations, dtype=str), return_inverse=True)
+        sums, rows = np.bincount(index, work, len(names)), np.bincount(index, minlength=len(names))
+        for location, minutes, count in zip(names.tolist(), sums.tolist(), rows.tolist()):
+            self.count(location, int(minutes), count)
+
+    def count(self, location, minutes, rows):
+        entry = self.locations.setdefault(location, [0, 0])
+        entry[0] += minutes
+        entry[1] += rows
+        if not entry[1]:
+            del self.locations[location]